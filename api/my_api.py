@@ -1,146 +1,309 @@
 # api/my_api.py
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import List
 from fastapi import FastAPI, HTTPException
-from whois import whois
-import socket
-import requests
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+import asyncio
+import functools
+import time
+import httpx
 import json
-import re
+import os
+import sys
 from bs4 import BeautifulSoup
 import ssl
-from OpenSSL import crypto
 
-app = FastAPI()
+# The API shares the app's extractors, certificate parser and WHOIS
+# engine, so the repository root is made importable when it runs as
+# `cd api; python my_api.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def get_geolocation(ip):
+from extractors import extract
+from tls_harvester import parse_certificate
+from whois_engine import whois_engine
+
+# One pooled async HTTP client serves every request on the worker
+http_client = None
+
+# Batch endpoints: targets accepted per request and lookups run at once
+BATCH_MAX_TARGETS = 1000
+BATCH_CONCURRENCY = 50
+
+# Response cache: seconds each route's results stay fresh, and entries
+# kept per route before the least recently used are evicted
+CACHE_TTLS = {"whois": 604800, "geoip": 3600, "ssl": 3600, "phone": 600, "email": 600}
+CACHE_MAX_ENTRIES = 4096
+
+IP_API_URL = "http://ip-api.com/json/"
+IP_API_BATCH_URL = "http://ip-api.com/batch"
+IP_API_BATCH_SIZE = 100
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global http_client
+    http_client = httpx.AsyncClient(timeout=10, limits=httpx.Limits(max_connections=200, max_keepalive_connections=50))
+    try:
+        yield
+    finally:
+        await http_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Building a context loads the CA store, so it is done once and shared
+ssl_context = ssl.create_default_context()
+
+
+class AsyncTTLCache:
+    # TTL + LRU cache with single-flight loading: while a key is being
+    # looked up, concurrent requests for it await the same upstream call
+    # instead of starting their own.
+
+    def __init__(self, ttl, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_load(self, key, loader):
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._loaded, key))
+        else:
+            self.coalesced += 1
+        # shield() keeps one client disconnecting from cancelling the
+        # lookup the other waiters depend on
+        return await asyncio.shield(task)
+
+    def _loaded(self, key, task):
+        del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        self.put(key, task.result())
+
+    def peek(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        if isinstance(value, dict) and "error" in value:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "size": len(self._entries)}
+
+
+caches = {}
+
+
+def cached_lookup(route, normalize=str.strip):
+    cache = caches[route] = AsyncTTLCache(CACHE_TTLS[route])
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(target):
+            return await cache.get_or_load(normalize(target or ""), lambda: func(target))
+        return wrapper
+    return decorator
+
+
+def normalize_domain(domain):
+    return domain.strip().lower().rstrip(".")
+
+
+async def run_blocking(func, *args):
+    # For work with no async API (HTML parsing), so it runs
+    # in the default executor instead of stalling the event loop.
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+async def fetch_page_text(url):
+    response = await http_client.get(url, timeout=5, follow_redirects=True)
+    response.raise_for_status()
+    return await run_blocking(lambda: BeautifulSoup(response.content, 'html.parser').get_text())
+
+
+@cached_lookup("geoip")
+async def get_geolocation(ip):
     if not ip:
         return {"error": "IP Address cannot be empty."}
-    url = f"http://ip-api.com/json/{ip}"
+    url = f"{IP_API_URL}{ip}"
     try:
-        response = requests.get(url, timeout=10)
+        response = await http_client.get(url, timeout=10)
         response.raise_for_status()
         return response.json()
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         return {"error": f"API error: {e}"}
     except json.JSONDecodeError as e:
         return {"error": f"Error decoding JSON: {e}"}
 
 
-def get_ssl_certificate_info(domain):
+@cached_lookup("ssl", normalize_domain)
+async def get_ssl_certificate_info(domain):
     if not domain:
       return {"error": "Domain cannot be empty."}
+    writer = None
     try:
-        conn = socket.create_connection((domain, 443), timeout=5)
-        context = ssl.create_default_context()
-        sock = context.wrap_socket(conn, server_hostname=domain)
-        cert = ssl.DER_cert_to_PEM_cert(sock.getpeercert(True))
-        x509 = crypto.load_certificate(crypto.FILETYPE_PEM, cert)
-
-        issuer_components = x509.get_issuer().get_components()
-        subject_components = x509.get_subject().get_components()
-
-        issuer = {}
-        subject = {}
-
-        if isinstance(issuer_components, tuple):
-           try:
-              issuer = {k.decode(): v.decode() for k, v in issuer_components}
-           except:
-             issuer = {"Error" : "Failed to Decode"}
-        elif isinstance(issuer_components, dict):
-           try:
-               issuer = {k.decode(): v.decode() for k, v in issuer_components.items()}
-           except:
-               issuer = {"Error" : "Failed to Decode"}
-        else:
-           issuer = {"Error" : "Issuer components is not a dictionary or tuple"}
-
-        if isinstance(subject_components, tuple):
-           try:
-               subject = {k.decode(): v.decode() for k, v in subject_components}
-           except:
-               subject = {"Error" : "Failed to Decode"}
-        elif isinstance(subject_components, dict):
-            try:
-                subject = {k.decode(): v.decode() for k, v in subject_components.items()}
-            except:
-                subject = {"Error" : "Failed to Decode"}
-        else:
-           subject = {"Error": "Subject components is not a dictionary or tuple"}
-
-        return {
-              "Issuer": issuer,
-              "Subject": subject,
-              "Version": x509.get_version(),
-              "Serial Number": x509.get_serial_number(),
-            }
-    except socket.timeout:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(domain, 443, ssl=ssl_context, server_hostname=domain), 5)
+        return parse_certificate(writer.get_extra_info("ssl_object").getpeercert(True))
+    except asyncio.TimeoutError:
        return {"error" : "Connection timed out while retrieving SSL certificate"}
     except Exception as e:
         return {"error": f"Error retrieving SSL certificate: {e}"}
+    finally:
+        # abort() closes the socket now instead of waiting on the TLS
+        # close_notify exchange
+        if writer is not None:
+            writer.transport.abort()
 
-def get_phone_number_lookup(query):
+@cached_lookup("phone")
+async def get_phone_number_lookup(query):
     if not query:
         return {"message": "No query provided for phone number lookup"}
-    phone_number_regex = re.compile(r'(\+?\d{1,3}[-.\s]?)?(\(?\d{1,4}\)?[-.\s]?)?(\d{1,4}[-.\s]?\d{1,9})')
-    numbers = []
+    text = query
     if query.startswith('http'):
        try:
-           response = requests.get(query,timeout=5)
-           response.raise_for_status()
-           soup = BeautifulSoup(response.content, 'html.parser')
-           text = soup.get_text() 
-           for match in phone_number_regex.finditer(text):
-               numbers.append(match.group().strip()) 
-       except requests.exceptions.RequestException as e:
+           text = await fetch_page_text(query)
+       except httpx.HTTPError as e:
           return {"error": f"Error accessing webpage {query}: {e}"}
-
-    elif isinstance(query,str):
-      for match in phone_number_regex.finditer(query):
-        numbers.append(match.group().strip())
+    numbers = extract(text)["phone"]
     if numbers:
-        return list(set(numbers)) 
+        return numbers
     return {"message": "No phone numbers detected"}
 
 
 
-def get_email_lookup(query):
+@cached_lookup("email")
+async def get_email_lookup(query):
      if not query:
          return {"message": "No query provided for email lookup"}
-     email_regex = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
-     emails = []
+     text = query
      if query.startswith('http'):
          try:
-            response = requests.get(query, timeout =5)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            text = soup.get_text()
-            for match in email_regex.finditer(text):
-                emails.append(match.group().strip())
-         except requests.exceptions.RequestException as e:
+            text = await fetch_page_text(query)
+         except httpx.HTTPError as e:
           return {"error" : f"Error accessing webpage {query}: {e}"}
-
-     elif isinstance(query,str):
-      for match in email_regex.finditer(query):
-        emails.append(match.group().strip())
-
+     emails = extract(text)["email"]
      if emails:
-        return list(set(emails))
+        return emails
      return {"message" : "No emails detected"}
 
+@cached_lookup("whois", normalize_domain)
+async def get_whois_info(domain):
+    if not domain:
+        return {"error": "Domain cannot be empty."}
+    # The engine throttles each registry without tying up its workers
+    w = await asyncio.wrap_future(whois_engine.submit(domain))
+    if isinstance(w, dict):
+        return w
+    return w.__dict__
+
+
+class BatchRequest(BaseModel):
+    targets: List[str]
+
+
+async def stream_batch(targets, lookup):
+    # Runs the lookups concurrently and writes one NDJSON line per target
+    # as soon as it finishes, so clients can consume results while the
+    # rest of the batch is still running.
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(target):
+        async with semaphore:
+            try:
+                return target, await lookup(target)
+            except Exception as e:
+                return target, {"error": f"Error: {e}"}
+
+    tasks = [asyncio.ensure_future(run(target)) for target in dict.fromkeys(targets)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            target, result = await next_done
+            yield json.dumps({"target": target, "result": result}, default=str) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def batch_response(request, lookup):
+    if len(request.targets) > BATCH_MAX_TARGETS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_TARGETS} targets per batch")
+    return StreamingResponse(stream_batch(request.targets, lookup), media_type="application/x-ndjson")
+
+async def wait_for_ip_api_quota(response):
+    # ip-api reports the requests left in the window (X-Rl) and the
+    # seconds until it resets (X-Ttl); pause instead of running into 429s
+    if response.headers.get("X-Rl") == "0":
+        await asyncio.sleep(int(response.headers.get("X-Ttl", "60")))
+
+
+async def stream_geolocation_batch(ips):
+    # Cached IPs are answered straight away; the rest go to ip-api's
+    # /batch endpoint 100 at a time instead of one request per IP.
+    cache = caches["geoip"]
+    missing = []
+    for ip in dict.fromkeys(ip.strip() for ip in ips):
+        cached = cache.peek(ip)
+        if cached is None:
+            missing.append(ip)
+        else:
+            yield json.dumps({"target": ip, "result": cached}) + "\n"
+    for offset in range(0, len(missing), IP_API_BATCH_SIZE):
+        chunk = missing[offset:offset + IP_API_BATCH_SIZE]
+        try:
+            response = await http_client.post(IP_API_BATCH_URL, json=chunk, timeout=15)
+            response.raise_for_status()
+            answers = {answer.get("query"): answer for answer in response.json()}
+            error = {"error": "No geolocation returned"}
+            await wait_for_ip_api_quota(response)
+        except (httpx.HTTPError, json.JSONDecodeError, AttributeError) as e:
+            answers = {}
+            error = {"error": f"API error: {e}"}
+        cache.misses += len(chunk)
+        for ip in chunk:
+            result = answers.get(ip, error)
+            cache.put(ip, result)
+            yield json.dumps({"target": ip, "result": result}) + "\n"
+
 @app.get("/whois/{domain}")
 async def read_whois(domain: str):
-    try:
-        w = whois(domain)
-        if w.domain_name is None:
-            raise HTTPException(status_code=404, detail="Domain not found")
-        return w.__dict__
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {e}")
+    whois_data = await get_whois_info(domain)
+    if whois_data.get("error", "").endswith("not found"):
+        raise HTTPException(status_code=404, detail="Domain not found")
+    if "error" in whois_data:
+        raise HTTPException(status_code=500, detail=f"Error: {whois_data['error']}")
+    return whois_data
 
 @app.get("/geoip/{ip}")
 async def read_geoip(ip: str):
     try:
-       geo_data = get_geolocation(ip)
+       geo_data = await get_geolocation(ip)
        if "error" in geo_data:
             raise HTTPException(status_code=400, detail=geo_data["error"])
        return geo_data
@@ -150,33 +313,72 @@ async def read_geoip(ip: str):
 @app.get("/ssl/{domain}")
 async def read_ssl(domain: str):
     try:
-       ssl_data = get_ssl_certificate_info(domain)
+       ssl_data = await get_ssl_certificate_info(domain)
        if "error" in ssl_data:
          raise HTTPException(status_code=400, detail=ssl_data["error"])
        return ssl_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {e}")
 
-@app.get("/phone/{query}")
+class QueryRequest(BaseModel):
+    query: str
+
+
+# The :path converter keeps URLs with slashes in one parameter; large text
+# should be POSTed as {"query": ...} instead.
+@app.get("/phone/{query:path}")
 async def read_phone_lookup(query: str):
     try:
-        phone_data = get_phone_number_lookup(query)
+        phone_data = await get_phone_number_lookup(query)
         if "error" in phone_data:
              raise HTTPException(status_code=400, detail=phone_data["error"])
         return phone_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {e}")
 
-@app.get("/email/{query}")
+@app.post("/phone")
+async def post_phone_lookup(request: QueryRequest):
+    return await read_phone_lookup(request.query)
+
+@app.get("/email/{query:path}")
 async def read_email_lookup(query: str):
   try:
-     email_data = get_email_lookup(query)
+     email_data = await get_email_lookup(query)
      if "error" in email_data:
          raise HTTPException(status_code=400, detail=email_data["error"])
      return email_data
   except Exception as e:
     raise HTTPException(status_code=500, detail=f"Error: {e}")
 
+@app.post("/email")
+async def post_email_lookup(request: QueryRequest):
+    return await read_email_lookup(request.query)
+
+@app.post("/batch/whois")
+async def batch_whois(request: BatchRequest):
+    return batch_response(request, get_whois_info)
+
+@app.post("/batch/geoip")
+async def batch_geoip(request: BatchRequest):
+    if len(request.targets) > BATCH_MAX_TARGETS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_TARGETS} targets per batch")
+    return StreamingResponse(stream_geolocation_batch(request.targets), media_type="application/x-ndjson")
+
+@app.post("/batch/ssl")
+async def batch_ssl(request: BatchRequest):
+    return batch_response(request, get_ssl_certificate_info)
+
+@app.post("/batch/phone")
+async def batch_phone_lookup(request: BatchRequest):
+    return batch_response(request, get_phone_number_lookup)
+
+@app.post("/batch/email")
+async def batch_email_lookup(request: BatchRequest):
+    return batch_response(request, get_email_lookup)
+
+@app.get("/cache/stats")
+async def read_cache_stats():
+    return {route: cache.stats() for route, cache in caches.items()}
 
 
 if __name__ == "__main__":
@@ -1,12 +1,17 @@
 import requests
 import json
 from urllib.parse import urljoin
-from config import SHODAN_API_KEY, VIRUSTOTAL_API_KEY, IP_API_BASE_URL, MY_API_BASE_URL
+import http_client
+from config import SHODAN_API_KEY, VIRUSTOTAL_API_KEY, IP_API_BASE_URL, MY_API_BASE_URL, MY_API_BATCH_SIZE
+from cache_utils import cached
 
 
-def _make_api_call(url, api_type, headers=None, timeout=10):
+def _make_api_call(url, api_type, headers=None, timeout=10, json_body=None):
     try:
-        response = requests.get(url, headers=headers, timeout=timeout)
+        if json_body is not None:
+            response = http_client.post(url, headers=headers, json=json_body, timeout=timeout)
+        else:
+            response = http_client.get(url, headers=headers, timeout=timeout)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -15,6 +20,7 @@ def _make_api_call(url, api_type, headers=None, timeout=10):
         return {"error": f"Error decoding JSON from {api_type}: {e}"}
 
 
+@cached("shodan")
 def shodan_lookup(ip):
     if not ip:
         return {"error": "IP Address cannot be empty."}
@@ -24,6 +30,7 @@ def shodan_lookup(ip):
     return _make_api_call(url, "Shodan")
 
 
+@cached("virustotal")
 def virustotal_lookup(domain):
     if not domain:
         return {"error": "Domain cannot be empty."}
@@ -34,6 +41,7 @@ def virustotal_lookup(domain):
     return _make_api_call(url, "VirusTotal", headers=headers)
 
 
+@cached("my_api")
 def my_api_whois(domain):
     if not domain:
         return {"error": "Domain cannot be empty."}
@@ -41,6 +49,7 @@ def my_api_whois(domain):
     return _make_api_call(url, "My API")
 
 
+@cached("my_api")
 def my_api_geoip(ip):
     if not ip:
         return {"error": "IP Address cannot be empty."}
@@ -48,6 +57,7 @@ def my_api_geoip(ip):
     return _make_api_call(url, "My API")
 
 
+@cached("my_api")
 def my_api_ssl(domain):
     if not domain:
         return {"error": "Domain cannot be empty."}
@@ -55,15 +65,67 @@ def my_api_ssl(domain):
     return _make_api_call(url, "My API")
 
 
+@cached("my_api")
 def my_api_phone(query):
     if not query:
         return {"error": "Query cannot be empty."}
-    url = urljoin(MY_API_BASE_URL, f"/phone/{query}")
-    return _make_api_call(url, "My API")
+    # POSTed so long text and URLs with slashes survive intact
+    url = urljoin(MY_API_BASE_URL, "/phone")
+    return _make_api_call(url, "My API", json_body={"query": query})
 
 
+@cached("my_api")
 def my_api_email(query):
     if not query:
         return {"error": "Query cannot be empty."}
-    url = urljoin(MY_API_BASE_URL, f"/email/{query}")
-    return _make_api_call(url, "My API")
+    url = urljoin(MY_API_BASE_URL, "/email")
+    return _make_api_call(url, "My API", json_body={"query": query})
+
+
+def _my_api_batch(kind, targets, batch_size=MY_API_BATCH_SIZE):
+    # Sends the targets to My API's batch endpoint in chunks and yields
+    # (target, result) pairs as the NDJSON lines stream back. If a chunk
+    # fails, every target in it that got no answer yields the error.
+    targets = [target for target in dict.fromkeys(targets) if target]
+    url = urljoin(MY_API_BASE_URL, f"/batch/{kind}")
+    for offset in range(0, len(targets), batch_size):
+        chunk = targets[offset:offset + batch_size]
+        answered = set()
+        try:
+            with http_client.post(url, json={"targets": chunk}, stream=True, timeout=(10, 120)) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    item = json.loads(line)
+                    answered.add(item["target"])
+                    yield item["target"], item["result"]
+        except requests.exceptions.RequestException as e:
+            error = {"error": f"My API API error: {e}"}
+        except json.JSONDecodeError as e:
+            error = {"error": f"Error decoding JSON from My API: {e}"}
+        else:
+            continue
+        for target in chunk:
+            if target not in answered:
+                yield target, error
+
+
+def my_api_whois_batch(domains):
+    return _my_api_batch("whois", domains)
+
+
+def my_api_geoip_batch(ips):
+    return _my_api_batch("geoip", ips)
+
+
+def my_api_ssl_batch(domains):
+    return _my_api_batch("ssl", domains)
+
+
+def my_api_phone_batch(queries):
+    return _my_api_batch("phone", queries)
+
+
+def my_api_email_batch(queries):
+    return _my_api_batch("email", queries)
@@ -1,9 +1,19 @@
 import socket
 import asyncio
+import contextlib
+import errno
+import time
 import streamlit as st
 import random
 import math
 
+from config import SCAN_CONCURRENCY, SCAN_TIMING
+from scan_timing import RttTimer
+from cache_utils import cached, NotCached
+
+# Minimum progress change between progress_callback calls
+PROGRESS_STEP = 0.005
+
 def get_neon_loading_animation(progress):
     hue = int((progress * 360 * 3) % 360)
     return f"""
@@ -32,45 +42,213 @@ def get_neon_loading_animation(progress):
     """
 
 
-async def async_scan_port(ip, port):
+async def iter_windowed(items, run, concurrency):
+    # Windowed producer/consumer shared by the scanners and probers: runs
+    # the coroutine function `run` on each item of a sync or async iterable
+    # with at most `concurrency` calls in flight, yielding results as they
+    # finish. Items are pulled lazily, so memory and file descriptors stay
+    # flat however long the input is, and an async source (e.g. a stream
+    # that is still downloading) is consumed while it produces.
+    in_flight = set()
+    next_item = None
+    if hasattr(items, "__aiter__"):
+        source = items.__aiter__()
+        items = None
+    else:
+        source = None
+        items = iter(items)
+
+    def fill_window():
+        for item in items:
+            in_flight.add(asyncio.ensure_future(run(item)))
+            if len(in_flight) >= concurrency:
+                break
+
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(0.1)
-        result = sock.connect_ex((ip, port))
-        sock.close()
-        if result == 0:
+        if source is None:
+            fill_window()
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                in_flight.difference_update(done)
+                fill_window()
+                for task in done:
+                    yield task.result()
+            return
+
+        # An async source is awaited alongside the running calls, one item
+        # at a time, so a slow producer doesn't stall finished results
+        exhausted = False
+        while True:
+            if next_item is None and not exhausted and len(in_flight) < concurrency:
+                next_item = asyncio.ensure_future(source.__anext__())
+            waiting = in_flight | {next_item} if next_item is not None else in_flight
+            if not waiting:
+                break
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if next_item in done:
+                done.discard(next_item)
+                try:
+                    in_flight.add(asyncio.ensure_future(run(next_item.result())))
+                except StopAsyncIteration:
+                    exhausted = True
+                next_item = None
+            in_flight.difference_update(done)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in in_flight:
+            task.cancel()
+        if next_item is not None:
+            next_item.cancel()
+
+
+async def async_scan_port(ip, port, timer=None):
+    # A bare non-blocking socket is much cheaper per probe than
+    # asyncio.open_connection, which builds a transport and stream pair.
+    # Answers (open or refused) feed the host's RTT timer; probes that get
+    # no answer at all are ambiguous and are retried with the current timeout.
+    loop = asyncio.get_running_loop()
+    if timer is None:
+        timer = RttTimer(SCAN_TIMING)
+    for _ in range(timer.max_retries + 1):
+        sock = None
+        started = time.perf_counter()
+        try:
+            sock = socket.socket(socket.AF_INET6 if ":" in ip else socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timer.timeout)
+            timer.record(time.perf_counter() - started)
             return port
-        return None
-    except socket.gaierror as e:
-        return {"error": f"Socket error: {e}"}
-    except OSError as e:
-      if e.errno == 111: 
-        return None
-      return {"error": f"An OS error occurred: {e}"}
-    except Exception as e:
-        return {"error": f"An error occurred: {e}"}
-
-
-async def async_port_scan(ip, start_port, end_port, progress_callback=None):
-    if not isinstance(start_port, int) or not isinstance(end_port, int) or start_port < 1 or end_port > 65535 or start_port > end_port:
+        except asyncio.TimeoutError:
+            continue
+        except ConnectionRefusedError:
+            timer.record(time.perf_counter() - started)
+            return None
+        except socket.gaierror as e:
+            return {"error": f"Socket error: {e}"}
+        except OSError as e:
+          if e.errno in (errno.EHOSTUNREACH, errno.ENETUNREACH, errno.ECONNRESET):
+            return None
+          return {"error": f"An OS error occurred: {e}"}
+        except Exception as e:
+            return {"error": f"An error occurred: {e}"}
+        finally:
+            if sock is not None:
+                sock.close()
+    return None
+
+
+async def _limited_scan_port(ip, port, timer, limiter):
+    async with limiter:
+        return await async_scan_port(ip, port, timer)
+
+
+async def iter_open_ports(ip, start_port, end_port, progress_callback=None, error_callback=None, concurrency=SCAN_CONCURRENCY, timing=SCAN_TIMING, limiter=None):
+    # Ports are pulled lazily from the range with at most `concurrency`
+    # probes in flight (see iter_windowed). An optional shared `limiter`
+    # semaphore lets several scans share one global budget.
+    timer = RttTimer(timing)
+    total_ports = end_port - start_port + 1
+    scanned = 0
+    reported = 0.0
+
+    async def probe(port):
+        if limiter is None:
+            return await async_scan_port(ip, port, timer)
+        return await _limited_scan_port(ip, port, timer, limiter)
+
+    # aclosing cancels the probes still in flight as soon as the caller
+    # stops iterating, rather than whenever the generator is collected
+    async with contextlib.aclosing(iter_windowed(range(start_port, end_port + 1), probe, concurrency)) as results:
+        async for result in results:
+            scanned += 1
+            if isinstance(result, int):
+                yield result
+            elif isinstance(result, dict) and "error" in result and error_callback:
+                error_callback(result["error"])
+            progress = scanned / total_ports
+            if progress_callback and (progress - reported >= PROGRESS_STEP or scanned == total_ports):
+                reported = progress
+                progress_callback(progress)
+
+
+def _valid_port_range(start_port, end_port):
+    return isinstance(start_port, int) and isinstance(end_port, int) and 1 <= start_port <= end_port <= 65535
+
+
+@cached("portscan")
+async def async_port_scan(ip, start_port, end_port, progress_callback=None, concurrency=SCAN_CONCURRENCY, timing=SCAN_TIMING):
+    if not _valid_port_range(start_port, end_port):
         st.error("Invalid port range.")
         return []
 
-    total_ports = end_port - start_port + 1
-    tasks = []
     open_ports = []
+    errors = set()
+
+    async for port in iter_open_ports(ip, start_port, end_port, progress_callback, errors.add, concurrency, timing):
+        open_ports.append(port)
+
+    for error in errors:
+        st.error(error)
+
+    if errors:
+        # Ports lost to socket errors may have been open, so the scan isn't
+        # trusted for the whole cache TTL
+        return NotCached(sorted(open_ports))
+    return sorted(open_ports)
+
+
+async def iter_batch_scan(targets, progress_callback=None, error_callback=None, concurrency=SCAN_CONCURRENCY, per_host_concurrency=None, timing=SCAN_TIMING):
+    # targets is a list of (ip, start_port, end_port). Every host is scanned
+    # on the running loop at the same time under one global `concurrency`
+    # budget; `per_host_concurrency` optionally caps each host's share.
+    # Yields (ip, open_ports) as each host finishes.
+    targets = [(ip, start_port, end_port) for ip, start_port, end_port in targets if _valid_port_range(start_port, end_port)]
+    if not targets:
+        return
+
+    limiter = asyncio.Semaphore(concurrency)
+    host_window = min(per_host_concurrency or concurrency, concurrency)
+    total_ports = sum(end_port - start_port + 1 for _, start_port, end_port in targets)
+    scanned = {}
+
+    def host_progress(key, ports_in_range):
+        def callback(progress):
+            scanned[key] = progress * ports_in_range
+            if progress_callback:
+                progress_callback(sum(scanned.values()) / total_ports)
+        return callback
+
+    async def scan_host(key, ip, start_port, end_port):
+        open_ports = []
+        async for port in iter_open_ports(ip, start_port, end_port, host_progress(key, end_port - start_port + 1), error_callback, host_window, timing, limiter):
+            open_ports.append(port)
+        return ip, sorted(open_ports)
+
+    tasks = [asyncio.ensure_future(scan_host(key, *target)) for key, target in enumerate(targets)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@cached("portscan")
+async def async_batch_port_scan(targets, progress_callback=None, concurrency=SCAN_CONCURRENCY, per_host_concurrency=None, timing=SCAN_TIMING):
+    if not all(_valid_port_range(start_port, end_port) for _, start_port, end_port in targets):
+        st.error("Invalid port range.")
+        return {}
+
+    results = {}
+    errors = set()
 
-    for port in range(start_port, end_port + 1):
-        task = asyncio.create_task(async_scan_port(ip, port))
-        tasks.append(task)
-        if progress_callback:
-          progress_callback((port - start_port + 1) / total_ports)
+    async for ip, open_ports in iter_batch_scan(targets, progress_callback, errors.add, concurrency, per_host_concurrency, timing):
+        results[ip] = open_ports
 
-    for task in tasks:
-        result = await task
-        if isinstance(result, int):
-            open_ports.append(result)
-        elif isinstance(result, dict) and "error" in result:
-            st.error(result["error"])  
+    for error in errors:
+        st.error(error)
 
-    return open_ports
+    if errors or len(results) < len({ip for ip, _, _ in targets}):
+        return NotCached(results)
+    return results
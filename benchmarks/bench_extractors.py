@@ -0,0 +1,72 @@
+# Extraction throughput of extractors.extract against the three separate
+# patterns it replaced. Run from anywhere with
+# `python benchmarks/bench_extractors.py [size_mb]`.
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractors import extract
+
+# The three patterns the page analysis used before this module, kept for
+# comparison in benchmark()
+LEGACY_REGEXES = (
+    re.compile(r'(\+?\d{1,3}[-.\s]?)?(\(?\d{1,4}\)?[-.\s]?)?(\d{1,4}[-.\s]?\d{1,9})'),
+    re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"),
+    re.compile(r"(facebook|twitter|instagram|linkedin|youtube)\.com"),
+)
+
+
+def _sample_text(size):
+    rng = random.Random(0)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10))) for _ in range(2000)]
+    pieces = []
+    length = 0
+    while length < size:
+        roll = rng.random()
+        if roll < 0.01:
+            piece = f"+62 812-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}"
+        elif roll < 0.02:
+            piece = f"{rng.choice(words)}.{rng.choice(words)}@{rng.choice(words)}.com"
+        elif roll < 0.025:
+            piece = f"https://www.instagram.com/{rng.choice(words)}/"
+        elif roll < 0.03:
+            # Long digit runs (ids, hashes, inline data) are where the old
+            # phone pattern backtracked
+            piece = "".join(rng.choices(string.digits, k=rng.randint(20, 200)))
+        else:
+            piece = rng.choice(words)
+        pieces.append(piece)
+        length += len(piece) + 1
+    return " ".join(pieces)
+
+
+def benchmark(size_mb=4, repeat=3):
+    # Prints extraction throughput on a synthetic page of `size_mb`
+    # megabytes, for the combined pattern and the old separate ones.
+    text = _sample_text(size_mb * 1024 * 1024)
+    megabytes = len(text) / (1024 * 1024)
+
+    def best_of(func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    combined = best_of(lambda: extract(text))
+    legacy = best_of(lambda: [list(regex.finditer(text)) for regex in LEGACY_REGEXES])
+    found = extract(text)
+    print(f"Sample: {megabytes:.1f} MB, {len(found['phone'])} phones, {len(found['email'])} emails, {len(found['social'])} social links")
+    print(f"Combined single pass:   {combined:.3f}s ({megabytes / combined:.1f} MB/s)")
+    print(f"Legacy separate passes: {legacy:.3f}s ({megabytes / legacy:.1f} MB/s)")
+    return {"megabytes": megabytes, "combined_seconds": combined, "legacy_seconds": legacy}
+
+
+if __name__ == "__main__":
+    benchmark(float(sys.argv[1]) if len(sys.argv) > 1 else 4)
@@ -0,0 +1,189 @@
+import functools
+import hashlib
+import inspect
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+
+from config import CACHE_DB_PATH, CACHE_MAX_ENTRIES, CACHE_TTLS
+
+
+class TTLCache:
+    # In-memory LRU cache with per-entry expiry, optionally backed by a
+    # SQLite file so results survive a restart of the Streamlit server.
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, db_path=CACHE_DB_PATH):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires REAL NOT NULL, value BLOB NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+            self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    return True, value
+                del self._entries[key]
+            if self._db is None:
+                return False, None
+            row = self._db.execute("SELECT expires, value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[0] <= now:
+                return False, None
+            try:
+                value = pickle.loads(row[1])
+            except Exception:
+                return False, None
+            self._store(key, row[0], value)
+            return True, value
+
+    def set(self, key, value, ttl):
+        expires = time.time() + ttl
+        with self._lock:
+            self._store(key, expires, value)
+            if self._db is not None:
+                try:
+                    blob = pickle.dumps(value)
+                except Exception:
+                    return
+                self._db.execute("INSERT OR REPLACE INTO cache (key, expires, value) VALUES (?, ?, ?)", (key, expires, blob))
+                self._db.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache")
+                self._db.commit()
+
+    def _store(self, key, expires, value):
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+lookup_cache = TTLCache()
+
+
+class DigestSet:
+    # Set of strings remembered by an 8-byte BLAKE2 digest rather than the
+    # string itself, for deduplicating very large streams (subdomains,
+    # crawled URLs, extracted findings) in bounded memory.
+
+    def __init__(self):
+        self._seen = set()
+
+    def add(self, key):
+        # True if the key was not seen before
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        if digest in self._seen:
+            return False
+        self._seen.add(digest)
+        return True
+
+    def __len__(self):
+        return len(self._seen)
+
+
+# Dotted hostnames and IPv4/IPv6 literals, the only strings whose case
+# doesn't matter
+HOST_REGEX = re.compile(r"(?:[A-Za-z0-9_-]+\.)+[A-Za-z0-9_-]+\.?|[0-9A-Fa-f:.]*:[0-9A-Fa-f:.]*")
+
+
+def normalize_target(value):
+    # Only the host part of a target is case-insensitive: URLs keep their
+    # path and query as given, and anything that isn't a hostname or URL
+    # (free-text queries, phone numbers, e-mail addresses) is left alone.
+    if isinstance(value, str):
+        stripped = value.strip()
+        if "://" in stripped:
+            try:
+                parts = urlsplit(stripped)
+            except ValueError:
+                return value
+            netloc = parts.netloc.lower()
+            host = parts.hostname or ""
+            if host.endswith("."):
+                netloc = netloc.replace(host, host.rstrip("."), 1)
+            return urlunsplit((parts.scheme.lower(), netloc, parts.path, parts.query, parts.fragment))
+        if HOST_REGEX.fullmatch(stripped):
+            return stripped.lower().rstrip(".")
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_target(item) for item in value)
+    return value
+
+
+def make_cache_key(func, args, kwargs):
+    # Callables (progress callbacks and the like) don't change the result,
+    # so they are left out of the key.
+    params = tuple(normalize_target(arg) for arg in args if not callable(arg))
+    named = tuple(sorted((name, normalize_target(value)) for name, value in kwargs.items() if not callable(value)))
+    raw = repr((f"{func.__module__}.{func.__qualname__}", params, named))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class NotCached:
+    # Wraps a result that @cached should hand back but not store, such as
+    # a scan that completed despite errors
+    def __init__(self, value):
+        self.value = value
+
+
+def _cacheable(result):
+    return not (isinstance(result, dict) and "error" in result)
+
+
+def cached(source, cache=None):
+    # Memoises a lookup for CACHE_TTLS[source] seconds. Error results, and
+    # results the function wraps in NotCached, are never cached, so a
+    # transient failure is retried on the next call.
+    ttl = CACHE_TTLS[source]
+
+    def decorator(func):
+        store = cache or lookup_cache
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = make_cache_key(func, args, kwargs)
+                hit, value = store.get(key)
+                if hit:
+                    return value
+                result = await func(*args, **kwargs)
+                if isinstance(result, NotCached):
+                    return result.value
+                if _cacheable(result):
+                    store.set(key, result, ttl)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_cache_key(func, args, kwargs)
+            hit, value = store.get(key)
+            if hit:
+                return value
+            result = func(*args, **kwargs)
+            if isinstance(result, NotCached):
+                return result.value
+            if _cacheable(result):
+                store.set(key, result, ttl)
+            return result
+        return wrapper
+
+    return decorator
@@ -1,5 +1,106 @@
 # config.py
 SHODAN_API_KEY = "" # Ganti dengan API Key jika ada, biarkan kosong jika tidak digunakan ("")
 VIRUSTOTAL_API_KEY = "YOUR_VIRUSTOTAL_API_KEY" # Ganti dengan API Key jika ada
-IP_API_BASE_URL = "http://ip-api.com/json/"
-MY_API_BASE_URL = "http://localhost:8000" # Sesuaikan dengan URL API Anda
\ No newline at end of file
+IP_API_BASE_URL = "http://ip-api.com" # Single lookups go to <base>/json/<ip>, batches to <base>/batch
+IP_API_BATCH_SIZE = 100 # IPs per ip-api /batch request (the service maximum)
+IP_API_RATE_LIMIT = 45 # ip-api free tier: single lookups per minute
+IP_API_BATCH_RATE_LIMIT = 15 # ip-api free tier: /batch requests per minute
+GEOIP_DB_PATH = "" # Local GeoIP database (.mmdb or CSV ranges) used instead of ip-api.com when the file exists
+MY_API_BASE_URL = "http://localhost:8000" # Sesuaikan dengan URL API Anda
+PHONE_DEFAULT_REGION = "" # Region (e.g. "ID") for national phone numbers; with the phonenumbers package they become E.164
+MY_API_BATCH_SIZE = 500 # Targets sent per My API batch request (the service accepts up to 1000)
+
+# Port scanner tuning
+SCAN_CONCURRENCY = 500 # Maximum number of connects in flight (bounds open file descriptors)
+SCAN_TIMING = "normal" # Timing template: paranoid, sneaky, polite, normal, aggressive, insane
+SCAN_WORKERS = None # Processes used by sharded_port_scan (None uses every CPU core)
+SCAN_SHARD_SIZE = 4096 # Ports per shard handed to each worker process
+
+# Lookup cache
+CACHE_MAX_ENTRIES = 1024 # Results kept in memory before the least recently used are evicted
+CACHE_DB_PATH = "" # SQLite file for a persistent cache, e.g. "osint_cache.db" (empty keeps it in memory only)
+CACHE_TTLS = { # Seconds each kind of result stays fresh
+    "whois": 604800,
+    "dns": 300,
+    "subdomains": 3600,
+    "ssl": 3600,
+    "geoip": 86400,
+    "shodan": 3600,
+    "virustotal": 3600,
+    "web": 600,
+    "my_api": 600,
+    "portscan": 900,
+}
+
+# Analysis pipeline
+PIPELINE_WORKERS = 16 # Lookups run at the same time
+LOOKUP_TIMEOUTS = { # Seconds each lookup may take before the page moves on without it
+    "whois": 20,
+    "my_api_whois": 20,
+    "dns": 10,
+    "dns_records": 10,
+    "subdomains": 120,
+    "ssl": 10,
+    "geolocation": 10,
+    "my_api_geolocation": 10,
+    "shodan": 15,
+    "ports": 900,
+    "tls": 60,
+    "services": 120,
+    "page": 20,
+    "crawl": 120,
+    "virustotal": 15,
+}
+
+# HTTP client
+HTTP_TIMEOUT = 10 # Default request timeout in seconds
+HTTP_POOL_CONNECTIONS = 16 # Number of hosts with a kept-alive connection pool
+HTTP_POOL_MAXSIZE = 16 # Connections kept alive per host
+HTTP_MAX_RETRIES = 2 # Retries for connection errors and 429/5xx answers
+HTTP_BACKOFF_FACTOR = 0.3 # Backoff between retries: factor * 2 ** (retry - 1) seconds
+
+# DNS resolver
+DNS_NAMESERVERS = [] # Nameserver IPs to query, e.g. ["1.1.1.1", "8.8.8.8"] (empty uses the system resolver)
+DNS_PORT = 53 # Port used with DNS_NAMESERVERS
+DNS_TIMEOUT = 5 # Seconds allowed per query, including retries
+DNS_CONCURRENCY = 200 # Names resolved at once by the bulk resolver
+DNS_CACHE_SIZE = 100000 # Answers kept in the shared, TTL-respecting DNS cache
+
+# WHOIS engine
+WHOIS_WORKERS = 32 # WHOIS queries running at once across all registries
+WHOIS_PER_REGISTRY = 2 # Queries in flight per TLD registry
+WHOIS_MIN_INTERVAL = 1.0 # Seconds between the start of two queries to the same registry
+WHOIS_BACKOFF = 60 # Seconds a registry is left alone after it reports a rate limit
+WHOIS_TIMEOUT = 10 # Socket timeout for each WHOIS query
+
+# Bulk file ingestion
+INGEST_CHUNK_SIZE = 1024 * 1024 # Bytes read at a time when scanning files without mmap
+INGEST_SHARD_SIZE = 64 * 1024 * 1024 # Bytes of a file handed to each worker process
+INGEST_WORKERS = None # Processes used for scanning (None uses every CPU core)
+
+# Site crawler
+CRAWL_MAX_PAGES = 50 # Pages fetched per crawl
+CRAWL_CONCURRENCY = 16 # Pages fetched at once
+CRAWL_PER_HOST = 4 # Pages fetched at once from any one host
+CRAWL_MAX_PAGE_BYTES = 5 * 1024 * 1024 # Larger responses are cut off at this size
+CRAWL_USER_AGENT = "YudS-OSINT" # User agent sent and matched against robots.txt
+
+# TLS certificate harvester
+TLS_PORTS = (443, 8443) # Ports always checked for certificates, on top of open ports found by the scan
+TLS_TIMEOUT = 5 # Seconds allowed for connect plus handshake
+TLS_CONCURRENCY = 200 # Handshakes in flight (bounds open file descriptors)
+
+# Subdomain enumeration
+CRT_SH_URL = "https://crt.sh/" # Certificate transparency search used for subdomains
+CRT_SH_CHUNK_SIZE = 65536 # Bytes read from the crt.sh response at a time
+SUBDOMAIN_INDEX_PATH = "subdomain_index.db" # SQLite index of crt.sh certificates and subdomains seen (empty disables it)
+MONITORED_DOMAINS = [] # Domains re-enumerated daily by the scheduled task, e.g. ["example.com"]
+
+# Technology fingerprinting
+FINGERPRINTS_PATH = "" # Wappalyzer-format signature file, e.g. a merged technologies.json (empty uses the bundled fingerprints.json)
+
+# Service probing
+PROBE_TIMEOUT = 3 # Seconds allowed for each connect or TLS handshake, and for each reply to a probe
+PROBE_BANNER_WAIT = 1.0 # Seconds to wait for a service to greet the client before probing it
+PROBE_CONCURRENCY = 100 # Ports probed at once
+PROBE_MAX_BYTES = 4096 # Bytes of each reply kept for identification
@@ -0,0 +1,237 @@
+import asyncio
+import collections
+import importlib.util
+import time
+import urllib.robotparser
+from urllib.parse import urljoin, urldefrag, urlsplit, urlunsplit
+
+import httpx
+from bs4 import BeautifulSoup
+
+import http_client
+from cache_utils import DigestSet
+from config import CRAWL_MAX_PAGES, CRAWL_CONCURRENCY, CRAWL_PER_HOST, CRAWL_MAX_PAGE_BYTES, CRAWL_USER_AGENT, HTTP_TIMEOUT
+from extractors import extract, extract_page
+
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+# Links to these are never pages worth spending the budget on
+SKIPPED_EXTENSIONS = frozenset((
+    ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".bmp",
+    ".css", ".js", ".json", ".xml", ".pdf", ".zip", ".gz", ".tar", ".rar", ".7z",
+    ".mp3", ".mp4", ".avi", ".mov", ".webm", ".woff", ".woff2", ".ttf", ".eot", ".exe", ".dmg",
+))
+
+
+def normalize_url(url):
+    # Canonical form used for deduplication: no fragment, lowercase scheme
+    # and host, no default port, "/" for an empty path
+    url, _ = urldefrag(url)
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    netloc = host if port is None or (parts.scheme, port) in (("http", 80), ("https", 443)) else f"{host}:{port}"
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path or "/", parts.query, ""))
+
+
+def _site_host(url):
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def _parse_page(body, content_type, url):
+    # Runs in a worker thread: returns the page's findings and the
+    # normalized links on it
+    text = body.decode("utf-8", "replace")
+    if "html" not in content_type:
+        return extract(text), []
+    soup = BeautifulSoup(text, HTML_PARSER)
+    links = []
+    for link in soup.find_all("a", href=True):
+        try:
+            links.append(normalize_url(urljoin(url, link["href"])))
+        except ValueError:
+            # Malformed port or IPv6 literal in the href
+            continue
+    return extract_page(soup), links
+
+
+class SiteCrawler:
+    # Breadth-first crawl of one site (its host and subdomains) that obeys
+    # robots.txt, including Crawl-delay. At most `concurrency` pages are
+    # fetched at once, at most `per_host` from any single host, and no
+    # more than `max_pages` in total.
+
+    def __init__(self, start_url, max_pages=CRAWL_MAX_PAGES, concurrency=CRAWL_CONCURRENCY, per_host=CRAWL_PER_HOST, user_agent=CRAWL_USER_AGENT, timeout=HTTP_TIMEOUT):
+        if "://" not in start_url:
+            start_url = "https://" + start_url
+        self.start_url = normalize_url(start_url)
+        self.site = _site_host(self.start_url)
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.visited = DigestSet()
+        self.skipped_by_robots = 0
+        self._robots = {}
+        self._host_slots = {}
+        self._next_fetch = {}
+
+    def in_scope(self, url):
+        parts = urlsplit(url)
+        host = parts.hostname or ""
+        return parts.scheme in ("http", "https") and (host == self.site or host.endswith("." + self.site))
+
+    def _worth_fetching(self, url):
+        path = urlsplit(url).path.lower()
+        return not any(path.endswith(extension) for extension in SKIPPED_EXTENSIONS)
+
+    async def _load_robots(self, origin):
+        parser = urllib.robotparser.RobotFileParser(origin + "/robots.txt")
+        try:
+            response = await http_client.get_async_client().get(
+                origin + "/robots.txt", headers={"User-Agent": self.user_agent}, timeout=self.timeout, follow_redirects=True
+            )
+        except httpx.HTTPError:
+            parser.allow_all = True
+            return parser
+        # As in RFC 9309: a missing robots.txt allows everything, a server
+        # error disallows everything
+        if response.status_code >= 500:
+            parser.disallow_all = True
+        elif response.status_code >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(response.text.splitlines())
+        return parser
+
+    async def robots_for(self, url):
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self._robots:
+            self._robots[origin] = asyncio.ensure_future(self._load_robots(origin))
+        return await self._robots[origin]
+
+    async def _wait_for_crawl_delay(self, host, delay):
+        if not delay:
+            return
+        now = time.monotonic()
+        start = max(now, self._next_fetch.get(host, 0.0))
+        self._next_fetch[host] = start + delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def fetch(self, url):
+        # Returns a page result dict and the links found on the page
+        robots = await self.robots_for(url)
+        if not robots.can_fetch(self.user_agent, url):
+            self.skipped_by_robots += 1
+            return None, []
+        host = urlsplit(url).hostname
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host)
+        await self._host_slots[host].acquire()
+        try:
+            await self._wait_for_crawl_delay(host, robots.crawl_delay(self.user_agent))
+            async with http_client.get_async_client().stream(
+                "GET", url, headers={"User-Agent": self.user_agent}, timeout=self.timeout, follow_redirects=True
+            ) as response:
+                content_type = response.headers.get("Content-Type", "")
+                final_url = normalize_url(str(response.url))
+                body = bytearray()
+                if content_type.startswith("text/") or "html" in content_type:
+                    async for chunk in response.aiter_bytes():
+                        body += chunk
+                        if len(body) >= CRAWL_MAX_PAGE_BYTES:
+                            break
+        except httpx.HTTPError as e:
+            return {"url": url, "error": f"Error accessing webpage {url}: {e}"}, []
+        finally:
+            self._host_slots[host].release()
+
+        page = {"url": final_url, "status": response.status_code, "phone": [], "email": [], "social": []}
+        if final_url != url:
+            self.visited.add(final_url)
+        if response.status_code >= 400 or not body or not self.in_scope(final_url):
+            return page, []
+        found, links = await asyncio.get_running_loop().run_in_executor(None, _parse_page, bytes(body), content_type, final_url)
+        page.update(found)
+        return page, links
+
+    async def iter_pages(self):
+        # Yields one result per fetched page as soon as it is parsed
+        frontier = collections.deque([self.start_url])
+        self.visited.add(self.start_url)
+        in_flight = {}
+        started = 0
+        try:
+            while frontier or in_flight:
+                while frontier and len(in_flight) < self.concurrency and started < self.max_pages:
+                    url = frontier.popleft()
+                    in_flight[asyncio.ensure_future(self.fetch(url))] = url
+                    started += 1
+                if not in_flight:
+                    break
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url = in_flight.pop(task)
+                    try:
+                        page, links = task.result()
+                    except Exception as e:
+                        # Anything fetch doesn't turn into an error result
+                        # (httpx.InvalidURL and the like) costs this page
+                        # only, not the rest of the crawl
+                        page, links = {"url": url, "error": f"Error accessing webpage {url}: {e}"}, []
+                    if page is None:
+                        # Disallowed by robots.txt, so it doesn't count
+                        # against the page budget
+                        started -= 1
+                    for link in links:
+                        if self.in_scope(link) and self._worth_fetching(link) and self.visited.add(link):
+                            frontier.append(link)
+                    if page is not None:
+                        yield page
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+
+async def iter_crawl(start_url, **kwargs):
+    async for page in SiteCrawler(start_url, **kwargs).iter_pages():
+        yield page
+
+
+def crawl_site(start_url, callback=None, **kwargs):
+    # Crawls the site and returns the phones, e-mails and social links found
+    # anywhere on it, each with the first page it appeared on.
+    # `callback(page)` sees every page result as it arrives.
+    crawler = SiteCrawler(start_url, **kwargs)
+    found = {"phone": {}, "email": {}, "social": {}}
+    errors = []
+
+    async def collect():
+        pages = 0
+        try:
+            async for page in crawler.iter_pages():
+                pages += 1
+                if "error" in page:
+                    errors.append(page["error"])
+                for kind, values in found.items():
+                    for value in page.get(kind, []):
+                        values.setdefault(value, page["url"])
+                if callback is not None:
+                    callback(page)
+        finally:
+            await http_client.close_async_client()
+        return pages
+
+    pages = asyncio.run(collect())
+    return {
+        "pages_crawled": pages,
+        "skipped_by_robots": crawler.skipped_by_robots,
+        "phone": found["phone"],
+        "email": found["email"],
+        "social": found["social"],
+        "errors": errors,
+    }
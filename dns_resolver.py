@@ -0,0 +1,85 @@
+import asyncio
+import contextlib
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+from config import DNS_NAMESERVERS, DNS_PORT, DNS_TIMEOUT, DNS_CONCURRENCY, DNS_CACHE_SIZE
+from async_utils import iter_windowed
+
+RECORD_TYPES = ("A", "AAAA", "MX", "NS", "TXT", "CNAME")
+ADDRESS_TYPES = ("A", "AAAA")
+
+# dnspython's LRUCache honours each answer's TTL and is thread-safe, so
+# one instance is shared by every resolver and event loop in the process.
+dns_cache = dns.resolver.LRUCache(DNS_CACHE_SIZE)
+
+
+def make_resolver(nameservers=DNS_NAMESERVERS, port=DNS_PORT, timeout=DNS_TIMEOUT):
+    resolver = dns.asyncresolver.Resolver(configure=not nameservers)
+    if nameservers:
+        resolver.nameservers = list(nameservers)
+        resolver.port = port
+    resolver.lifetime = timeout
+    resolver.cache = dns_cache
+    return resolver
+
+
+async def resolve_records(name, rdtypes=RECORD_TYPES, resolver=None):
+    # Queries every record type for `name` in parallel. Returns
+    # {rdtype: [values]} with empty types left out; raises NXDOMAIN if the
+    # name does not exist at all.
+    resolver = resolver or make_resolver()
+
+    async def query(rdtype):
+        try:
+            answer = await resolver.resolve(name, rdtype)
+            return rdtype, [record.to_text() for record in answer]
+        except (dns.resolver.NoAnswer, dns.resolver.NoNameservers, dns.exception.Timeout):
+            return rdtype, []
+
+    results = await asyncio.gather(*(query(rdtype) for rdtype in rdtypes), return_exceptions=True)
+    records = {}
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+        rdtype, values = result
+        if values:
+            records[rdtype] = values
+    return records
+
+
+async def _unique(names):
+    seen = set()
+    async for name in names:
+        if name not in seen:
+            seen.add(name)
+            yield name
+
+
+async def iter_resolve_many(names, rdtypes=ADDRESS_TYPES, concurrency=DNS_CONCURRENCY, resolver=None):
+    # Resolves names from a sync or async iterable (e.g. a crt.sh subdomain
+    # stream that is still downloading) with at most `concurrency` names in
+    # flight, yielding (name, records) as each finishes. Repeated names are
+    # resolved once. Names that fail yield {"error": ...} instead of records.
+    resolver = resolver or make_resolver()
+    names = _unique(names) if hasattr(names, "__aiter__") else dict.fromkeys(names)
+
+    async def resolve(name):
+        try:
+            return name, await resolve_records(name, rdtypes, resolver)
+        except dns.resolver.NXDOMAIN:
+            return name, {"error": "Domain does not exist"}
+        except Exception as e:
+            return name, {"error": f"{e}"}
+
+    async with contextlib.aclosing(iter_windowed(names, resolve, concurrency)) as results:
+        async for result in results:
+            yield result
+
+
+def resolve_many(names, rdtypes=ADDRESS_TYPES, concurrency=DNS_CONCURRENCY, nameservers=DNS_NAMESERVERS):
+    async def collect():
+        return {name: records async for name, records in iter_resolve_many(names, rdtypes, concurrency, make_resolver(nameservers))}
+    return asyncio.run(collect())
@@ -1,131 +1,147 @@
 import re
+import importlib.util
 from bs4 import BeautifulSoup
 import requests
 import streamlit as st
+import http_client
 
-def phone_number_lookup(query):
-    if not query:
-        return {"message": "No query provided for phone number lookup"}
-    phone_number_regex = re.compile(r'(\+?\d{1,3}[-.\s]?)?(\(?\d{1,4}\)?[-.\s]?)?(\d{1,4}[-.\s]?\d{1,9})')
-    numbers = []
-    if query.startswith('http'): 
-       try:
-           response = requests.get(query,timeout=5)
-           response.raise_for_status()
-           soup = BeautifulSoup(response.content, 'html.parser')
-           text = soup.get_text() 
-           for match in phone_number_regex.finditer(text):
-               numbers.append(match.group().strip()) 
-       except requests.exceptions.RequestException as e:
-          return {"error": f"Error accessing webpage {query}: {e}"}
-
-    elif isinstance(query,str):
-      for match in phone_number_regex.finditer(query):
-        numbers.append(match.group().strip())
+from cache_utils import cached
+from extractors import extract, extract_page
+from ingest import ingest
+from crawler import crawl_site
+from fingerprints import get_engine
+
+# lxml builds the tree several times faster than the pure-Python parser
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+USER_AGENT_OS_REGEX = re.compile(r'\(([^;)]+)')
 
+
+def _phone_result(numbers):
     if numbers:
-        return list(set(numbers)) 
+        return numbers
     return {"message": "No phone numbers detected"}
 
 
+def _email_result(emails):
+    if emails:
+        return emails
+    return {"message": "No emails detected"}
 
-def email_lookup(query):
-     if not query:
-         return {"message": "No query provided for email lookup"}
-     email_regex = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
-     emails = []
-     if query.startswith('http'):
-         try:
-            response = requests.get(query, timeout =5)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            text = soup.get_text()
-            for match in email_regex.finditer(text):
-                emails.append(match.group().strip())
-         except requests.exceptions.RequestException as e:
-          return {"error" : f"Error accessing webpage {query}: {e}"}
 
-     elif isinstance(query,str):
-      for match in email_regex.finditer(query):
-        emails.append(match.group().strip())
+def _detect_technologies(response, soup):
+    detected = get_engine().analyze_page(response, soup)
+    return {
+        "headers": {"Server": response.headers.get('Server', "Not Found")},
+        "html_patterns": [item["name"] for item in detected] or ["None"],
+        "technologies": detected,
+    }
 
-     if emails:
-        return list(set(emails))
-     return {"message" : "No emails detected"}
 
+def _detect_os(response):
+    user_agent = response.request.headers.get('User-Agent')
+    if not user_agent:
+        return "No User-Agent header found."
+    os_match = USER_AGENT_OS_REGEX.search(user_agent)
+    if os_match:
+        return os_match.group(1)
+    return "Operating system information not detected"
 
-def technology_detection(url):
+
+def _fetch_robots_txt(url):
+    try:
+        robots_response = http_client.get(url.rstrip('/') + "/robots.txt", timeout=5)
+        if robots_response.status_code == 200:
+            return robots_response.text
+        return "robots.txt not found"
+    except requests.exceptions.RequestException:
+        return "robots.txt error"
+
+
+@cached("web")
+def analyze_page(url):
+    # Downloads and parses the page once, then runs every extractor over
+    # the shared tree and text. The per-feature lookups below are views
+    # onto this result.
     if not url:
-       return {"error": "URL cannot be empty."}
-    with st.spinner(f"Detecting Technologies for {url}"):
+        return {"error": "URL cannot be empty."}
+    with st.spinner(f"Analyzing page {url}"):
         try:
-            response = requests.get(url, timeout = 5)
+            response = http_client.get(url, timeout=5)
             response.raise_for_status()
-            tech = {"headers" : {}, "html_patterns" : []}
-
-            if 'Server' in response.headers:
-                tech["headers"]["Server"] = response.headers['Server']
-            else:
-                tech["headers"]["Server"] = "Not Found"
-            soup = BeautifulSoup(response.content, 'html.parser')
-            if soup.find(attrs={"id": "wpadminbar"}) :
-                tech["html_patterns"].append("Wordpress")
-            if soup.find("meta", attrs={"name": "generator"}) and "Joomla" in  soup.find("meta", attrs={"name": "generator"})["content"]:
-                tech["html_patterns"].append("Joomla")
-            if not tech["html_patterns"]:
-                tech["html_patterns"].append("None")
-            return tech
         except requests.exceptions.RequestException as e:
-            return {"error": f"Error during tech detection: {e}"}
+            return {"error": f"Error accessing webpage {url}: {e}"}
+        soup = BeautifulSoup(response.content, HTML_PARSER)
+        found = extract_page(soup)
+        return {
+            "phone": _phone_result(found["phone"]),
+            "email": _email_result(found["email"]),
+            "technology": _detect_technologies(response, soup),
+            "os": _detect_os(response),
+            "domain_info": {
+                "social_media": found["social"],
+                "robots_txt": _fetch_robots_txt(url),
+            },
+        }
+
+
+def _page_section(url, section):
+    page = analyze_page(url)
+    if "error" in page:
+        return page
+    return page[section]
+
+
+def phone_number_lookup(query):
+    # query is text or a URL; local files go through phone_number_file_lookup
+    if not query:
+        return {"message": "No query provided for phone number lookup"}
+    if query.startswith('http'):
+        return _page_section(query, "phone")
+    return _phone_result(extract(query)["phone"])
+
+
+def email_lookup(query):
+    if not query:
+        return {"message": "No query provided for email lookup"}
+    if query.startswith('http'):
+        return _page_section(query, "email")
+    return _email_result(extract(query)["email"])
+
+
+def phone_number_file_lookup(paths):
+    # Bulk scan of local files and directories. Kept apart from
+    # phone_number_lookup so free text that happens to name a path is
+    # never read from disk.
+    return _phone_result(ingest(paths, kinds=("phone",))["phone"])
+
+
+def email_file_lookup(paths):
+    return _email_result(ingest(paths, kinds=("email",))["email"])
+
+
+def technology_detection(url):
+    if not url:
+       return {"error": "URL cannot be empty."}
+    return _page_section(url, "technology")
 
 
 def os_detection(url):
-  if not url:
+    if not url:
        return {"error": "URL cannot be empty."}
-  with st.spinner(f"Detecting OS for {url}"):
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        user_agent = response.request.headers.get('User-Agent')
-        if user_agent:
-            os_match = re.search(r'\(([^;)]+)', user_agent)
-            if os_match:
-               return os_match.group(1)
-            else:
-               return "Operating system information not detected"
-        else:
-            return "No User-Agent header found."
-    except requests.exceptions.RequestException as e:
-          return {"error": f"Error during OS Detection {e}"}
+    return _page_section(url, "os")
 
 
 def gather_domain_info(url):
     if not url:
        return {"error": "URL cannot be empty."}
-    with st.spinner(f"Gathering domain info for {url}"):
-        try:
-           domain_info = {}
-           response = requests.get(url, timeout=5)
-           response.raise_for_status()
-           soup = BeautifulSoup(response.content, 'html.parser')
-
-           social_media_links = []
-           social_patterns = re.compile(r"(facebook|twitter|instagram|linkedin|youtube)\.com")
-           for link in soup.find_all('a', href=True):
-                if social_patterns.search(link['href']):
-                    social_media_links.append(link['href'])
-           domain_info['social_media'] = list(set(social_media_links))
-
-           try:
-               robots_url = url.rstrip('/') + "/robots.txt"
-               robots_response = requests.get(robots_url,timeout=5)
-               if robots_response.status_code == 200:
-                  domain_info['robots_txt'] = robots_response.text
-               else:
-                   domain_info['robots_txt'] = "robots.txt not found"
-           except requests.exceptions.RequestException as e:
-                domain_info['robots_txt'] = "robots.txt error"
-           return domain_info
+    return _page_section(url, "domain_info")
 
-        except requests.exceptions.RequestException as e:
-              return {"error" : f"Error accessing webpage: {e}"}
+
+@cached("web")
+def crawl_site_lookup(url):
+    # Site-wide phones, e-mails and social links, following links from url
+    if not url:
+       return {"error": "URL cannot be empty."}
+    with st.spinner(f"Crawling {url}"):
+        return crawl_site(url)
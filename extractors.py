@@ -0,0 +1,117 @@
+import re
+
+from config import PHONE_DEFAULT_REGION
+
+try:
+    import phonenumbers
+except ImportError:
+    phonenumbers = None
+
+# One pattern finds every kind of contact detail in a single pass; the
+# named group that matched says which kind it is. Every alternative is
+# anchored with a lookbehind so a run of word characters is only tried
+# from its first position, which keeps the scan linear on long digit or
+# letter runs. A social link needs a path after the host; a bare
+# "github.com" mentions the site rather than a profile.
+EXTRACT_REGEX = re.compile(
+    r"""
+    (?P<email>
+        (?<![\w.%+-])[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}(?![\w-])
+    )
+    | (?P<social>
+        (?<![\w.-])(?i:https?://)?(?i:www\.|m\.)?
+        (?P<network>(?i:facebook|twitter|x|instagram|linkedin|youtube|tiktok|github))(?i:\.com)
+        (?:/[\w.%~@-]+)+/?
+    )
+    | (?P<phone>
+        (?<![\w+])\+?(?:\(\d{1,4}\)[ .-]?)?\d(?:[ .-]?\d){6,14}(?!\d)
+    )
+    """,
+    re.VERBOSE,
+)
+
+# Same pattern for scanning raw bytes (memory-mapped files); every
+# alternative is ASCII, so UTF-8 input matches the same way
+BYTES_EXTRACT_REGEX = re.compile(EXTRACT_REGEX.pattern.encode(), re.VERBOSE)
+
+# Longest match worth reassembling across chunk boundaries
+MAX_MATCH_LENGTH = 1024
+
+SOCIAL_URL_REGEX = re.compile(r"(?:https?://)?(?:www\.|m\.)?([a-z]+)\.com(.*)", re.IGNORECASE | re.DOTALL)
+
+# Dates such as 2024-01-31 or 31.01.2024 look like phone numbers
+DATE_REGEX = re.compile(r"\d{4}[-./]\d{1,2}[-./]\d{1,2}|\d{1,2}[-./]\d{1,2}[-./]\d{4}")
+
+# "logo@2x.png" and friends look like e-mail addresses
+FILE_EXTENSIONS = frozenset(("png", "jpg", "jpeg", "gif", "svg", "webp", "ico", "css", "js"))
+
+E164_MAX_DIGITS = 15
+
+
+def normalize_phone(raw, region=PHONE_DEFAULT_REGION):
+    # E.164 when the country is known: from a leading + or 00, or from
+    # `region` for national numbers. With the optional phonenumbers package
+    # the number is also validated. Returns None for anything that can't
+    # be a phone number.
+    if DATE_REGEX.fullmatch(raw):
+        return None
+    if phonenumbers is not None:
+        try:
+            number = phonenumbers.parse(raw, region or None)
+        except phonenumbers.NumberParseException:
+            return None
+        if not phonenumbers.is_possible_number(number):
+            return None
+        return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+    digits = re.sub(r"\D", "", raw)
+    if raw.startswith("+"):
+        international = digits
+    elif digits.startswith("00"):
+        international = digits[2:]
+    else:
+        # National number and no way to tell its country without phonenumbers
+        return digits
+    if not 8 <= len(international) <= E164_MAX_DIGITS:
+        return None
+    return "+" + international
+
+
+def normalize_email(raw):
+    email = raw.lower().rstrip(".")
+    if email.rsplit(".", 1)[-1] in FILE_EXTENSIONS:
+        return None
+    return email
+
+
+def normalize_social(raw):
+    network, path = SOCIAL_URL_REGEX.match(raw).groups()
+    return f"https://{network.lower()}.com{path.rstrip('/')}"
+
+
+NORMALIZERS = {"phone": normalize_phone, "email": normalize_email, "social": normalize_social}
+
+
+def normalize(kind, raw, region=PHONE_DEFAULT_REGION):
+    if kind == "phone":
+        return normalize_phone(raw, region)
+    return NORMALIZERS[kind](raw)
+
+
+def extract(text, region=PHONE_DEFAULT_REGION):
+    # Returns {"phone": [...], "email": [...], "social": [...]} with each
+    # list normalised and deduplicated in order of first appearance.
+    found = {"phone": {}, "email": {}, "social": {}}
+    for match in EXTRACT_REGEX.finditer(text):
+        kind = match.lastgroup
+        value = normalize(kind, match.group(kind), region)
+        if value:
+            found[kind][value] = None
+    return {kind: list(values) for kind, values in found.items()}
+
+
+def extract_page(soup, region=PHONE_DEFAULT_REGION):
+    # extract() over a parsed HTML page. Link targets are scanned with the
+    # visible text so mailto:, tel: and social profile links are found in
+    # the same pass.
+    hrefs = "\n".join(link["href"] for link in soup.find_all("a", href=True))
+    return extract(soup.get_text("\n") + "\n" + hrefs, region)
@@ -0,0 +1,473 @@
+import json
+import os
+import random
+import re
+import string
+import time
+
+from config import FINGERPRINTS_PATH
+
+DEFAULT_FINGERPRINTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fingerprints.json")
+
+# Tokens are maximal runs of lowercase letters and digits. A rule is only
+# evaluated on pages containing its index token, which is chosen so that
+# any text the rule matches must contain it as a whole token.
+TOKEN_REGEX = re.compile(r"[a-z0-9]+")
+
+# Tokens that appear on nearly every page and so make poor index keys
+COMMON_TOKENS = frozenset(("com", "net", "org", "www", "http", "https", "js", "css", "min", "src", "html", "script", "static", "cdn", "assets", "v", "1", "2", "3"))
+
+# Placeholders standing for parts of a pattern while choosing its token
+_BOUNDARY = ("boundary", None)
+_SEPARATOR = ("separator", None)
+_UNKNOWN = ("unknown", None)
+
+
+class Pattern:
+    # One Wappalyzer pattern: a regex plus optional "\;version:" template
+    # and "\;confidence:" percentage
+    __slots__ = ("tech", "source", "regex", "version", "confidence", "token")
+
+    def __init__(self, tech, raw):
+        self.tech = tech
+        parts = raw.split("\\;")
+        self.source = parts[0]
+        self.regex = re.compile(self.source, re.IGNORECASE) if self.source else None
+        self.version = None
+        self.confidence = 100
+        for part in parts[1:]:
+            key, _, value = part.partition(":")
+            if key == "version":
+                self.version = value
+            elif key == "confidence" and value.isdigit():
+                self.confidence = int(value)
+        self.token = index_token(self.source)
+
+    def match(self, value):
+        # Returns the detected version ("" if unknown), or None for no match
+        if self.regex is None:
+            return ""
+        match = self.regex.search(value)
+        if match is None:
+            return None
+        if not self.version:
+            return ""
+
+        def group(ref):
+            index = int(ref.group(1))
+            try:
+                return match.group(index) or ""
+            except IndexError:
+                return ""
+        version = re.sub(r"\\(\d+)", group, self.version)
+        # Ternary templates: "\1?found:notfound"
+        if "?" in version:
+            condition, _, choices = version.partition("?")
+            found, _, not_found = choices.partition(":")
+            version = found if condition else not_found
+        return version.strip()
+
+
+def _split_alternatives(source):
+    # Splits a regex on its top-level "|"
+    alternatives = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(source):
+        ch = source[i]
+        if ch == "\\":
+            i += 1
+        elif ch == "[":
+            i += 1
+            while i < len(source) and source[i] != "]":
+                i += 2 if source[i] == "\\" else 1
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            alternatives.append(source[start:i])
+            start = i + 1
+        i += 1
+    alternatives.append(source[start:])
+    return alternatives
+
+
+def _group_item(body):
+    # A group is reduced to whether every alternative in it starts with a
+    # separator, which is all index_token needs to look past it
+    if body.startswith("?:"):
+        body = body[2:]
+    elif body.startswith("?P<"):
+        body = body[body.find(">") + 1:]
+    elif body.startswith("?"):
+        # Lookarounds and inline flags
+        return _UNKNOWN
+    starts_separated = True
+    for alternative in _split_alternatives(body):
+        items = _pattern_items(alternative)
+        if not items or not _delimits(items[0]):
+            starts_separated = False
+    return ("group", (starts_separated, False))
+
+
+def _pattern_items(source):
+    # Reduces a regex to the parts that matter for token safety: literal
+    # characters, boundaries (^, $, \b), separators (\s, punctuation
+    # classes), groups and "unknown" for anything else that can match
+    # variable text. Returns None if the pattern has a top-level
+    # alternation, which means no literal is required.
+    if len(_split_alternatives(source)) > 1:
+        return None
+    items = []
+    i = 0
+    while i < len(source):
+        ch = source[i]
+        if ch == "\\":
+            escaped = source[i + 1:i + 2]
+            if escaped == "b":
+                items.append(_BOUNDARY)
+            elif escaped == "s":
+                items.append(_SEPARATOR)
+            elif escaped and not escaped.isalnum():
+                items.append(("literal", escaped))
+            else:
+                items.append(_UNKNOWN)
+            i += 2
+            continue
+        if ch == "[":
+            start = i + 1
+            i += 1
+            while i < len(source) and source[i] != "]":
+                i += 2 if source[i] == "\\" else 1
+            members = source[start:i]
+            # A class of punctuation only, like ["'], separates tokens just
+            # as a literal quote would. Ranges could span letters.
+            if members and members[0] != "^" and "-" not in members[1:-1] and not any(c.isalnum() for c in members):
+                items.append(_SEPARATOR)
+            else:
+                items.append(_UNKNOWN)
+        elif ch == "(":
+            start = i + 1
+            depth = 1
+            i += 1
+            while i < len(source) and depth:
+                if source[i] == "\\":
+                    i += 1
+                elif source[i] == "(":
+                    depth += 1
+                elif source[i] == ")":
+                    depth -= 1
+                i += 1
+            items.append(_group_item(source[start:i - 1]))
+            continue
+        elif ch in "?*+{":
+            if items and items[-1][0] == "group":
+                if ch in "?*" or source.startswith("{0", i):
+                    starts_separated, _ = items[-1][1]
+                    items[-1] = ("group", (starts_separated, True))
+            elif items:
+                # The previous character may be absent or repeated
+                items[-1] = _UNKNOWN
+            if ch == "{":
+                while i < len(source) and source[i] != "}":
+                    i += 1
+        elif ch in "^$":
+            items.append(_BOUNDARY)
+        elif ch == ".":
+            items.append(_UNKNOWN)
+        else:
+            items.append(("literal", ch.lower()))
+        i += 1
+    return items
+
+
+def index_token(source):
+    # The longest alphanumeric literal in `source` that is delimited on both
+    # sides by a separator or a boundary, so every match contains it as a
+    # whole token. None if there is no such literal.
+    items = _pattern_items(source) if source else None
+    if not items:
+        return None
+    candidates = []
+    i = 0
+    while i < len(items):
+        kind, ch = items[i]
+        if kind == "literal" and ch.isalnum():
+            start = i
+            while i < len(items) and items[i][0] == "literal" and items[i][1].isalnum():
+                i += 1
+            if start > 0 and _delimits(items[start - 1]) and _delimits_after(items, i):
+                candidates.append("".join(ch for _, ch in items[start:i]))
+            continue
+        i += 1
+    candidates = [token for token in candidates if TOKEN_REGEX.fullmatch(token)]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda token: (token not in COMMON_TOKENS, len(token)))
+
+
+def _delimits(item):
+    kind, ch = item
+    return kind in ("boundary", "separator") or (kind == "literal" and not ch.isalnum())
+
+
+def _delimits_after(items, i):
+    # Whether whatever follows position i starts with a separator, looking
+    # past optional groups such as "(?:\.min)?"
+    while i < len(items) and items[i][0] == "group":
+        starts_separated, optional = items[i][1]
+        if not starts_separated:
+            return False
+        if not optional:
+            return True
+        i += 1
+    return i < len(items) and _delimits(items[i])
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+class RuleIndex:
+    # Patterns for one kind of input (script URLs, HTML, ...), split into
+    # those keyed by their index token and those that must always run
+    def __init__(self):
+        self.by_token = {}
+        self.always = []
+
+    def add(self, pattern):
+        if pattern.token:
+            self.by_token.setdefault(pattern.token, []).append(pattern)
+        else:
+            self.always.append(pattern)
+
+    def candidates(self, tokens):
+        if len(tokens) < len(self.by_token):
+            found = [pattern for token in tokens for pattern in self.by_token.get(token, ())]
+        else:
+            found = [pattern for token, patterns in self.by_token.items() if token in tokens for pattern in patterns]
+        return found + self.always
+
+    def __len__(self):
+        return sum(len(patterns) for patterns in self.by_token.values()) + len(self.always)
+
+
+class FingerprintEngine:
+    # Wappalyzer-style technology detection. Signatures are compiled once
+    # into lookups keyed by header, cookie and meta name, and into token
+    # indexes for script URLs, inline scripts, HTML and the page URL, so a page costs a
+    # few dictionary lookups plus the handful of regexes whose key token
+    # actually occurs on it.
+
+    def __init__(self, signatures):
+        technologies = signatures.get("technologies", signatures)
+        categories = signatures.get("categories", {})
+        self.technologies = {}
+        self.headers = {}
+        self.cookies = {}
+        self.meta = {}
+        self.script_src = RuleIndex()
+        self.scripts = RuleIndex()
+        self.html = RuleIndex()
+        self.url = RuleIndex()
+        self.skipped_patterns = 0
+        for name, definition in technologies.items():
+            self.technologies[name] = {
+                "categories": [categories.get(str(cat), {}).get("name", str(cat)) for cat in definition.get("cats", [])],
+                "implies": [implied.split("\\;")[0] for implied in _as_list(definition.get("implies"))],
+                "website": definition.get("website"),
+            }
+            for field, table in (("headers", self.headers), ("cookies", self.cookies), ("meta", self.meta)):
+                for key, raw in (definition.get(field) or {}).items():
+                    for pattern in self._compile(name, _as_list(raw)):
+                        table.setdefault(key.lower(), []).append(pattern)
+            for field, index in (("scriptSrc", self.script_src), ("scripts", self.scripts), ("html", self.html), ("url", self.url)):
+                for pattern in self._compile(name, _as_list(definition.get(field))):
+                    index.add(pattern)
+
+    def _compile(self, tech, raw_patterns):
+        for raw in raw_patterns:
+            try:
+                yield Pattern(tech, raw)
+            except re.error:
+                # Some upstream patterns use JavaScript-only regex syntax
+                self.skipped_patterns += 1
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @property
+    def pattern_count(self):
+        keyed = sum(len(patterns) for table in (self.headers, self.cookies, self.meta) for patterns in table.values())
+        return keyed + len(self.script_src) + len(self.scripts) + len(self.html) + len(self.url)
+
+    def analyze(self, url="", headers=None, cookies=None, meta=None, script_srcs=(), scripts=(), html=""):
+        # headers, cookies and meta map names to values; script_srcs are
+        # script URLs and scripts the bodies of inline scripts. Returns the
+        # detected technologies, implied ones included, as
+        # [{"name", "version", "confidence", "categories"}].
+        detections = {}
+
+        def record(pattern, value):
+            version = pattern.match(value)
+            if version is None:
+                return
+            confidence, best_version = detections.get(pattern.tech, (0, ""))
+            detections[pattern.tech] = (min(100, confidence + pattern.confidence), best_version or version)
+
+        for table, values in ((self.headers, headers), (self.cookies, cookies), (self.meta, meta)):
+            for key, value in (values or {}).items():
+                for pattern in table.get(key.lower(), ()):
+                    record(pattern, value)
+
+        for index, values in ((self.script_src, script_srcs), (self.scripts, scripts)):
+            if values:
+                tokens = set(TOKEN_REGEX.findall("\n".join(values).lower()))
+                for pattern in index.candidates(tokens):
+                    for value in values:
+                        if pattern.match(value) is not None:
+                            record(pattern, value)
+                            break
+        for index, value in ((self.html, html), (self.url, url)):
+            if value:
+                tokens = set(TOKEN_REGEX.findall(value.lower()))
+                for pattern in index.candidates(tokens):
+                    record(pattern, value)
+
+        self._add_implied(detections)
+        return [
+            {
+                "name": name,
+                "version": version or None,
+                "confidence": confidence,
+                "categories": self.technologies.get(name, {}).get("categories", []),
+            }
+            for name, (confidence, version) in sorted(detections.items())
+        ]
+
+    def _add_implied(self, detections):
+        pending = list(detections)
+        while pending:
+            name = pending.pop()
+            for implied in self.technologies.get(name, {}).get("implies", []):
+                if implied not in detections:
+                    detections[implied] = (detections[name][0], "")
+                    pending.append(implied)
+
+    def analyze_page(self, response, soup):
+        # Gathers every input from a requests response and its parsed page
+        # in one walk over the tree
+        meta = {}
+        for tag in soup.find_all("meta"):
+            key = tag.get("name") or tag.get("property") or tag.get("http-equiv")
+            if key and tag.get("content") is not None:
+                meta[key] = tag["content"]
+        script_srcs = []
+        scripts = []
+        for tag in soup.find_all("script"):
+            if tag.get("src"):
+                script_srcs.append(tag["src"])
+            elif tag.string:
+                scripts.append(tag.string)
+        return self.analyze(
+            url=response.url,
+            headers=dict(response.headers),
+            cookies=response.cookies.get_dict(),
+            meta=meta,
+            script_srcs=script_srcs,
+            scripts=scripts,
+            html=response.text,
+        )
+
+
+_engine = None
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = FingerprintEngine.from_file(FINGERPRINTS_PATH or DEFAULT_FINGERPRINTS_PATH)
+    return _engine
+
+
+def _synthetic_signatures(count, rng):
+    # Wappalyzer-shaped signatures with random product names, so the
+    # benchmark can run against far more rules than the bundled file has
+    technologies = {}
+    for i in range(count):
+        name = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10))) + str(i)
+        technologies[f"Tech {i}"] = {
+            "cats": [rng.randint(1, 60)],
+            "headers": {rng.choice(["X-Powered-By", "Server", "X-Generator"]): f"{name}(?:/([\\d.]+))?\\;version:\\1"},
+            "cookies": {f"{name}_session": ""},
+            "meta": {"generator": f"^{name} ?([\\d.]+)?\\;version:\\1"},
+            "scriptSrc": [f"/{name}(?:\\.min)?\\.js", f"{name}[.-]([\\d.]+)\\.js\\;version:\\1"],
+            "html": [f"<div[^>]+class=\"{name}-", f"<!-- {name} "],
+        }
+    return {"technologies": technologies}
+
+
+def _synthetic_page(technologies, size, rng):
+    names = list(technologies)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(3000)]
+    used = rng.sample(names, 5)
+    scripts = [f"https://cdn.example.com/{technologies[name]['scriptSrc'][0][1:].split('(')[0]}.js" for name in used]
+    html = [f"<script src=\"{src}\"></script>" for src in scripts]
+    while sum(len(piece) for piece in html) < size:
+        html.append(f"<div class=\"{rng.choice(words)}\"><p>{' '.join(rng.choices(words, k=12))}</p></div>")
+    return "\n".join(html), scripts
+
+
+def benchmark(signature_counts=(100, 1000, 5000), page_size=200_000, repeat=5):
+    # Per-page detection cost for growing signature sets, indexed engine
+    # against evaluating every pattern on every page
+    rng = random.Random(0)
+    results = []
+    for count in signature_counts:
+        signatures = _synthetic_signatures(count, rng)
+        engine = FingerprintEngine(signatures)
+        html, scripts = _synthetic_page(signatures["technologies"], page_size, rng)
+        page = {
+            "url": "https://example.com/",
+            "headers": {"Server": "nginx", "Content-Type": "text/html"},
+            "cookies": {"sessionid": "x"},
+            "meta": {"viewport": "width=device-width"},
+            "script_srcs": scripts,
+            "html": html,
+        }
+        all_patterns = [pattern for index in (engine.script_src, engine.scripts, engine.html) for patterns in list(index.by_token.values()) + [index.always] for pattern in patterns]
+
+        def indexed():
+            return engine.analyze(**page)
+
+        def naive():
+            for pattern in all_patterns:
+                pattern.match(html)
+            for patterns in list(engine.headers.values()) + list(engine.meta.values()) + list(engine.cookies.values()):
+                for pattern in patterns:
+                    pattern.match("")
+
+        timings = {}
+        # The full scan is slow enough that one run is representative
+        for label, func, runs in (("indexed", indexed, repeat), ("naive", naive, 1)):
+            best = float("inf")
+            for _ in range(runs):
+                start = time.perf_counter()
+                func()
+                best = min(best, time.perf_counter() - start)
+            timings[label] = best
+        detected = len(indexed())
+        print(f"{engine.pattern_count:6d} patterns: indexed {timings['indexed'] * 1000:7.2f} ms/page, "
+              f"every pattern {timings['naive'] * 1000:8.2f} ms/page, {detected} detected")
+        results.append({"patterns": engine.pattern_count, **timings})
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,211 @@
+import csv
+import ipaddress
+import json
+import mmap
+import os
+import struct
+
+try:
+    import maxminddb
+except ImportError:
+    maxminddb = None
+
+# Index file layout: magic, record count, then fixed-size records sorted by
+# range start (start and end as 16-byte big-endian IPv6 keys, IPv4 mapped
+# into ::ffff:0:0/96, plus offset and length of the location JSON), then
+# the deduplicated location JSON blobs. Fixed-size records let lookups
+# binary-search the memory-mapped file without loading it.
+INDEX_MAGIC = b"YGEOIDX1"
+HEADER = struct.Struct(">8sI")
+RECORD = struct.Struct(">16s16sII")
+
+CSV_FIELDS = ("start_ip", "end_ip", "countryCode", "country", "regionName", "city", "lat", "lon", "isp")
+
+
+def ip_key(ip):
+    address = ip if isinstance(ip, (ipaddress.IPv4Address, ipaddress.IPv6Address)) else ipaddress.ip_address(ip)
+    if address.version == 4:
+        return b"\0" * 10 + b"\xff\xff" + address.packed
+    return address.packed
+
+
+def _parse_range_bound(value):
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return ipaddress.IPv4Address(number) if number < 2 ** 32 else ipaddress.IPv6Address(number)
+    return ipaddress.ip_address(value)
+
+
+def build_index(csv_path, index_path):
+    # Rows are start_ip,end_ip,country_code,country,region,city,lat,lon[,isp]
+    # with addresses either dotted/colon notation or integers. A header
+    # row is skipped.
+    records = []
+    blobs = {}
+    blob_data = bytearray()
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#"):
+                continue
+            # Rows with an unparseable range or coordinates are skipped
+            # rather than failing the whole import
+            location = {field: value for field, value in zip(CSV_FIELDS[2:], row[2:]) if value != ""}
+            try:
+                start = _parse_range_bound(row[0])
+                end = _parse_range_bound(row[1])
+                for field in ("lat", "lon"):
+                    if field in location:
+                        location[field] = float(location[field])
+            except (ValueError, IndexError):
+                continue
+            blob = json.dumps(location, separators=(",", ":")).encode()
+            if blob not in blobs:
+                blobs[blob] = len(blob_data)
+                blob_data += blob
+            records.append((ip_key(start), ip_key(end), blobs[blob], len(blob)))
+
+    records.sort()
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(INDEX_MAGIC, len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+        f.write(blob_data)
+    os.replace(tmp_path, index_path)
+
+
+class RangeIndex:
+    def __init__(self, index_path):
+        self._file = open(index_path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{index_path} is not a GeoIP range index")
+        self._blobs_offset = HEADER.size + self.count * RECORD.size
+
+    def _start(self, i):
+        offset = HEADER.size + i * RECORD.size
+        return self._map[offset:offset + 16]
+
+    def _find(self, key, lo=0):
+        # Rightmost record whose range starts at or before key
+        hi = self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._start(mid) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo - 1
+
+    def _location(self, i, key):
+        if i < 0:
+            return None
+        _, end, blob_offset, blob_length = RECORD.unpack_from(self._map, HEADER.size + i * RECORD.size)
+        if key > end:
+            return None
+        start = self._blobs_offset + blob_offset
+        return json.loads(self._map[start:start + blob_length])
+
+    def lookup(self, ip):
+        key = ip_key(ip)
+        return self._location(self._find(key), key)
+
+    def lookup_many(self, ips):
+        # Sorting the queries lets each binary search start where the
+        # previous one ended, which matters when sweeping large IP lists.
+        results = {}
+        lo = 0
+        for key, ip in sorted((ip_key(ip), ip) for ip in ips):
+            i = self._find(key, lo)
+            lo = max(i, 0)
+            results[ip] = self._location(i, key)
+        return results
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class MaxMindIndex:
+    def __init__(self, path):
+        self._reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+
+    def lookup(self, ip):
+        record = self._reader.get(ip)
+        if not record:
+            return None
+        location = {}
+        if "country" in record:
+            location["countryCode"] = record["country"].get("iso_code")
+            location["country"] = record["country"].get("names", {}).get("en")
+        if record.get("subdivisions"):
+            location["regionName"] = record["subdivisions"][0].get("names", {}).get("en")
+        if "city" in record:
+            location["city"] = record["city"].get("names", {}).get("en")
+        if "location" in record:
+            location["lat"] = record["location"].get("latitude")
+            location["lon"] = record["location"].get("longitude")
+        if "autonomous_system_organization" in record:
+            location["isp"] = record["autonomous_system_organization"]
+        return {key: value for key, value in location.items() if value is not None}
+
+    def lookup_many(self, ips):
+        return {ip: self.lookup(ip) for ip in ips}
+
+    def close(self):
+        self._reader.close()
+
+
+class GeoIPDatabase:
+    # Local geolocation backed by a MaxMind .mmdb file (needs the optional
+    # maxminddb package) or a CSV range file, which is compiled once into
+    # a sorted index next to it and rebuilt whenever the CSV changes.
+    # Answers use ip-api's field names so callers can't tell the backends
+    # apart.
+
+    def __init__(self, path):
+        if path.endswith(".mmdb"):
+            if maxminddb is None:
+                raise ImportError("Reading .mmdb files requires the maxminddb package")
+            self._index = MaxMindIndex(path)
+        else:
+            index_path = path + ".idx"
+            if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(path):
+                build_index(path, index_path)
+            self._index = RangeIndex(index_path)
+
+    @staticmethod
+    def _answer(ip, location):
+        if location is None:
+            return {"status": "fail", "message": "not found in local GeoIP database", "query": ip}
+        return {"status": "success", **location, "query": ip, "source": "local"}
+
+    def lookup(self, ip):
+        try:
+            return self._answer(ip, self._index.lookup(ip))
+        except ValueError:
+            return {"status": "fail", "message": "invalid query", "query": ip}
+
+    def lookup_many(self, ips):
+        valid = []
+        results = {}
+        for ip in ips:
+            try:
+                ipaddress.ip_address(ip)
+                valid.append(ip)
+            except ValueError:
+                results[ip] = {"status": "fail", "message": "invalid query", "query": ip}
+        for ip, location in self._index.lookup_many(valid).items():
+            results[ip] = self._answer(ip, location)
+        return results
+
+    def close(self):
+        self._index.close()
+
+
+def open_geoip_database(path):
+    if not path or not os.path.exists(path):
+        return None
+    return GeoIPDatabase(path)
@@ -0,0 +1,144 @@
+import concurrent.futures
+import json
+import threading
+import time
+
+import requests
+
+import http_client
+from cache_utils import TTLCache
+from config import IP_API_BASE_URL, IP_API_BATCH_SIZE, IP_API_RATE_LIMIT, IP_API_BATCH_RATE_LIMIT, CACHE_TTLS, GEOIP_DB_PATH
+from geoip_db import open_geoip_database
+
+
+class TokenBucket:
+    # Client-side rate limiter for one ip-api endpoint. Tokens refill at
+    # `rate_per_minute`, and the X-Rl / X-Ttl headers from each answer
+    # correct the local estimate so we stop before the server says 429.
+
+    def __init__(self, rate_per_minute):
+        self.capacity = rate_per_minute
+        self.tokens = float(rate_per_minute)
+        self.refill_rate = rate_per_minute / 60.0
+        self.blocked_until = 0.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.refill_rate)
+            time.sleep(wait)
+
+    def update_from_headers(self, headers):
+        try:
+            remaining = int(headers["X-Rl"])
+            reset_in = int(headers["X-Ttl"])
+        except (KeyError, ValueError):
+            return
+        with self._lock:
+            self.tokens = min(self.tokens, remaining)
+            if remaining <= 0:
+                self.blocked_until = time.monotonic() + reset_in
+
+
+class GeolocationEngine:
+    # Resolves many IPs with as few ip-api requests as possible: answers
+    # are cached, IPs already being looked up by another thread are
+    # awaited instead of requested again, and the rest are grouped into
+    # /batch calls of up to IP_API_BATCH_SIZE addresses. When a local
+    # GeoIP database is configured it answers everything and ip-api is
+    # not contacted at all.
+
+    def __init__(self, base_url=IP_API_BASE_URL, batch_size=IP_API_BATCH_SIZE, db_path=GEOIP_DB_PATH):
+        # Appended rather than urljoin'ed so a base URL with a path prefix
+        # (e.g. behind a proxy) keeps it
+        self.single_url = base_url.rstrip("/") + "/json/"
+        self.batch_url = base_url.rstrip("/") + "/batch"
+        self.batch_size = batch_size
+        self.single_bucket = TokenBucket(IP_API_RATE_LIMIT)
+        self.batch_bucket = TokenBucket(IP_API_BATCH_RATE_LIMIT)
+        self.cache = TTLCache(db_path=None)
+        self.local_db = open_geoip_database(db_path)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, ip):
+        return self.lookup_many([ip])[ip]
+
+    def lookup_many(self, ips):
+        if self.local_db is not None:
+            return self.local_db.lookup_many(list(dict.fromkeys(ips)))
+        results = {}
+        waiting = {}
+        owned = []
+        with self._lock:
+            for ip in dict.fromkeys(ips):
+                hit, value = self.cache.get(ip)
+                if hit:
+                    results[ip] = value
+                elif ip in self._inflight:
+                    waiting[ip] = self._inflight[ip]
+                else:
+                    future = concurrent.futures.Future()
+                    self._inflight[ip] = waiting[ip] = future
+                    owned.append(ip)
+
+        try:
+            for offset in range(0, len(owned), self.batch_size):
+                self._fetch(owned[offset:offset + self.batch_size])
+        finally:
+            # A chunk that raised leaves the later ones unfetched; their
+            # futures are resolved anyway so no other thread waits forever
+            unfetched = [ip for ip in owned if not waiting[ip].done()]
+            if unfetched:
+                self._finish(unfetched, {}, {"error": "Geolocation lookup aborted"})
+
+        for ip, future in waiting.items():
+            results[ip] = future.result()
+        return results
+
+    def _fetch(self, ips):
+        # The futures for `ips` are resolved in the finally whatever goes
+        # wrong here, since other threads may be waiting on them
+        answers = {}
+        error = {"error": "Geolocation lookup failed"}
+        try:
+            if len(ips) == 1:
+                self.single_bucket.acquire()
+                response = http_client.get(self.single_url + ips[0], timeout=10)
+                self.single_bucket.update_from_headers(response.headers)
+                response.raise_for_status()
+                answers = {ips[0]: response.json()}
+            else:
+                self.batch_bucket.acquire()
+                response = http_client.post(self.batch_url, json=ips, timeout=15)
+                self.batch_bucket.update_from_headers(response.headers)
+                response.raise_for_status()
+                answers = {answer.get("query"): answer for answer in response.json()}
+            error = None
+        # requests' own JSONDecodeError is also a RequestException, so the
+        # decoding errors are caught first
+        except (json.JSONDecodeError, AttributeError, TypeError) as e:
+            error = {"error": f"Error decoding JSON: {e}"}
+        except requests.exceptions.RequestException as e:
+            error = {"error": f"API error: {e}"}
+        finally:
+            self._finish(ips, answers, error)
+
+    def _finish(self, ips, answers, error):
+        with self._lock:
+            for ip in ips:
+                result = answers.get(ip) or error or {"error": f"No geolocation returned for {ip}"}
+                if "error" not in result:
+                    self.cache.set(ip, result, CACHE_TTLS["geoip"])
+                self._inflight.pop(ip).set_result(result)
+
+
+geolocation_engine = GeolocationEngine()
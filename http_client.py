@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_MAX_RETRIES, HTTP_BACKOFF_FACTOR, HTTP_TIMEOUT
+
+_session = None
+_session_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_session():
+    # One shared Session keeps a keep-alive connection pool per host, so
+    # repeated calls to ip-api, Shodan, VirusTotal or My API skip the TCP
+    # and TLS handshakes. Idempotent requests are retried with backoff on
+    # connection errors and 429/5xx answers.
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=HTTP_MAX_RETRIES,
+                    backoff_factor=HTTP_BACKOFF_FACTOR,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=("GET", "HEAD"),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def get(url, **kwargs):
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    return get_session().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    return get_session().post(url, **kwargs)
+
+
+def get_async_client():
+    # httpx clients are bound to the event loop they were first used on,
+    # so each running loop gets its own pooled client.
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(max_connections=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE, max_keepalive_connections=HTTP_POOL_MAXSIZE)
+        client = httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(limits=limits, retries=HTTP_MAX_RETRIES), timeout=HTTP_TIMEOUT)
+        _async_clients[loop] = client
+    return client
+
+
+async def async_get(url, **kwargs):
+    return await get_async_client().get(url, **kwargs)
+
+
+async def close_async_client():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
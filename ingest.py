@@ -0,0 +1,172 @@
+import argparse
+import concurrent.futures
+import json
+import mmap
+import os
+import sys
+
+from cache_utils import DigestSet
+from config import INGEST_CHUNK_SIZE, INGEST_SHARD_SIZE, INGEST_WORKERS, PHONE_DEFAULT_REGION
+from extractors import BYTES_EXTRACT_REGEX, MAX_MATCH_LENGTH, normalize
+
+KINDS = ("phone", "email", "social")
+
+
+def iter_files(paths):
+    # Expands directories (e.g. a scraped site) into the files inside them
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def _shards(path, shard_size):
+    size = os.path.getsize(path)
+    return [(start, min(start + shard_size, size)) for start in range(0, max(size, 1), shard_size)]
+
+
+def _iter_mmap_matches(path, start, end):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            endpos = min(len(data), end + MAX_MATCH_LENGTH)
+            # Scanning from before the shard lines matches up with what a
+            # single pass would have found there, so a match straddling the
+            # shard boundary isn't picked up again as a shorter one.
+            for match in BYTES_EXTRACT_REGEX.finditer(data, max(0, start - MAX_MATCH_LENGTH), endpos):
+                if match.start() >= end:
+                    break
+                if match.end() == endpos and endpos < len(data):
+                    # Cut off by endpos: longer than MAX_MATCH_LENGTH
+                    continue
+                if match.start() >= start:
+                    yield match
+
+
+def _iter_chunked_matches(path, start, end, chunk_size):
+    # Reads chunk_size blocks and keeps only the unscanned tail between
+    # reads. A match ending within MAX_MATCH_LENGTH of the buffer's end may
+    # continue in the next block, so it is rescanned once more data is in.
+    offset = scan_from = max(0, start - MAX_MATCH_LENGTH)
+    buffer = b""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while scan_from < end:
+            data = f.read(chunk_size)
+            eof = not data
+            buffer += data
+            limit = offset + len(buffer) if eof else offset + len(buffer) - MAX_MATCH_LENGTH
+            next_scan = max(scan_from, limit)
+            for match in BYTES_EXTRACT_REGEX.finditer(buffer, scan_from - offset):
+                match_start, match_end = offset + match.start(), offset + match.end()
+                if match_start >= end:
+                    next_scan = end
+                    break
+                if match_end > limit:
+                    next_scan = match_start
+                    break
+                if match_start >= start:
+                    yield match
+            if eof:
+                break
+            scan_from = next_scan
+            # Keep a little context before scan_from for the lookbehinds
+            cut = max(0, scan_from - offset - 16)
+            buffer = buffer[cut:]
+            offset += cut
+
+
+def scan_shard(path, start, end, use_mmap=False, chunk_size=INGEST_CHUNK_SIZE, region=PHONE_DEFAULT_REGION):
+    # Distinct (kind, value) findings whose match starts in [start, end) of
+    # the file, normalised like extractors.extract
+    matches = _iter_mmap_matches(path, start, end) if use_mmap else _iter_chunked_matches(path, start, end, chunk_size)
+    found = {}
+    for match in matches:
+        kind = match.lastgroup
+        value = normalize(kind, match.group(kind).decode("utf-8", "replace"), region)
+        if value:
+            found[(kind, value)] = None
+    return path, list(found)
+
+
+def _scan_shard_task(task):
+    return scan_shard(*task)
+
+
+def iter_ingest(paths, use_mmap=False, workers=INGEST_WORKERS, shard_size=INGEST_SHARD_SIZE, chunk_size=INGEST_CHUNK_SIZE, region=PHONE_DEFAULT_REGION, kinds=KINDS):
+    # Scans files and directories for phones, e-mails and social links.
+    # Large files are split into shards, shards are fanned out over a
+    # process pool, and each distinct finding is yielded as (kind, value,
+    # path) as soon as the shard containing it is done.
+    tasks = [(path, start, end, use_mmap, chunk_size, region) for path in iter_files(paths) for start, end in _shards(path, shard_size)]
+    seen = DigestSet()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_scan_shard_task, task) for task in tasks]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                path, findings = future.result()
+                for kind, value in findings:
+                    if kind in kinds and seen.add(f"{kind}\0{value}"):
+                        yield kind, value, path
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def iter_ingest_stream(stream, chunk_size=INGEST_CHUNK_SIZE, region=PHONE_DEFAULT_REGION, kinds=KINDS):
+    # Same as iter_ingest for an unseekable binary stream such as stdin
+    # (pasted logs), scanned in this process.
+    seen = DigestSet()
+    buffer = b""
+    scan_from = 0
+    while True:
+        data = stream.read(chunk_size)
+        eof = not data
+        buffer += data
+        limit = len(buffer) if eof else len(buffer) - MAX_MATCH_LENGTH
+        next_scan = max(scan_from, limit)
+        for match in BYTES_EXTRACT_REGEX.finditer(buffer, scan_from):
+            if match.end() > limit:
+                next_scan = match.start()
+                break
+            kind = match.lastgroup
+            value = normalize(kind, match.group(kind).decode("utf-8", "replace"), region)
+            if value and kind in kinds and seen.add(f"{kind}\0{value}"):
+                yield kind, value, "-"
+        if eof:
+            break
+        cut = max(0, next_scan - 16)
+        buffer = buffer[cut:]
+        scan_from = next_scan - cut
+
+
+def ingest(paths, **kwargs):
+    # {"phone": [...], "email": [...], "social": [...]} for all of `paths`
+    results = {kind: [] for kind in kwargs.get("kinds", KINDS)}
+    for kind, value, _ in iter_ingest(paths, **kwargs):
+        results[kind].append(value)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract phone numbers, e-mails and social links from local files, printing one JSON line per distinct finding.")
+    parser.add_argument("paths", nargs="+", help="Files or directories to scan, or - for stdin")
+    parser.add_argument("--mmap", action="store_true", help="Memory-map files instead of reading them in chunks")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--kind", action="append", choices=KINDS, help="Only report this kind (repeatable)")
+    args = parser.parse_args(argv)
+    kinds = tuple(args.kind or KINDS)
+    if args.paths == ["-"]:
+        findings = iter_ingest_stream(sys.stdin.buffer, kinds=kinds)
+    else:
+        findings = iter_ingest(args.paths, use_mmap=args.mmap, workers=args.workers, kinds=kinds)
+    for kind, value, path in findings:
+        print(json.dumps({"kind": kind, "value": value, "source": path}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
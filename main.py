@@ -1,5 +1,4 @@
 import streamlit as st
-import asyncio
 import pandas as pd
 import plotly.graph_objects as go
 from reportlab.pdfgen import canvas
@@ -8,25 +7,24 @@ import time
 import schedule
 import json
 import requests
+import httpx
 
-from core_functions import whois_lookup, dns_lookup
-from async_utils import async_port_scan, get_neon_loading_animation
+from async_utils import get_neon_loading_animation
 from thread_utils import thread_port_scan
-from utils import get_geolocation
-from extra_functions import technology_detection, os_detection, gather_domain_info
-from api_integration import shodan_lookup, virustotal_lookup, my_api_whois, my_api_geoip, my_api_ssl, my_api_phone, my_api_email
-
-def subdomain_lookup(domain):
+from cache_utils import cached
+from results_model import TargetResults
+from pipeline import run_analysis, PAGE_LOOKUPS
+from subdomain_enum import resolve_subdomains, monitor_domain
+from config import MONITORED_DOMAINS
+
+@cached("subdomains")
+def subdomain_lookup(domain, callback=None):
     if not domain:
         return {"error": "Domain cannot be empty."}
     with st.spinner(f"Enumerating subdomains for {domain}"):
-        url = f"https://crt.sh/?q=%25.{domain}&output=json"
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            subdomains = [entry['name_value'] for entry in response.json()]
-            return list(set(subdomains))
-        except requests.exceptions.RequestException as e:
+            return resolve_subdomains(domain, callback)
+        except httpx.HTTPError as e:
             return {"error": f"Error fetching subdomains: {e}"}
         except json.JSONDecodeError as e:
            return {"error": f"Error decoding JSON: {e}"}
@@ -67,18 +65,35 @@ def format_port_output(ports):
     return output
 
 
-def create_pandas_dataframe(data):
-    if not data:
+def show_services(services):
+    if not services:
+        st.write("No services identified")
+        return
+    st.table(pd.DataFrame([
+        {
+            "Port": port,
+            "Service": service.get("service", "unknown"),
+            "Product": service.get("product", ""),
+            "TLS": service.get("tls_version", ""),
+            "Banner": service.get("banner", service.get("error", "")),
+        }
+        for port, service in services.items()
+    ]))
+
+
+def create_pandas_dataframe(results):
+    if not results:
         return None
     with st.spinner("Creating Dataframe"):
-        return pd.DataFrame(data)
+        return pd.DataFrame(results.to_rows())
 
 
-def generate_report(data, filename):
-    if not data:
+def generate_report(results, filename):
+    if not results:
        return {"error": "No Data to be exported"}
     with st.spinner(f"Generating PDF report as {filename}"):
         try:
+            data = results.to_report_data()
             pdf = canvas.Canvas(filename)
             pdf.setTitle("OSINT Report")
             pdf.drawString(100, 800, "OSINT Report")
@@ -107,6 +122,71 @@ def generate_report(data, filename):
         except Exception as e:
             return {"error": f"Error generating report: {e}"}
 
+DOMAIN_SECTION_TITLES = {
+    "whois": "WHOIS Lookup",
+    "my_api_whois": "WHOIS Lookup (My API)",
+    "dns": "DNS Lookup",
+    "dns_records": "DNS Records",
+    "subdomains": "Subdomain Enumeration",
+    "ssl": "SSL Certificate Information",
+}
+DOMAIN_RESULT_FIELDS = {"whois": "whois", "my_api_whois": "my_api_whois", "dns": "dns", "dns_records": "dns_records", "subdomains": "subdomains", "ssl": "ssl_info"}
+
+HOST_SECTION_TITLES = {
+    "geolocation": "Geolocation for {ip}",
+    "my_api_geolocation": "Geolocation (My API) for {ip}",
+    "shodan": "Shodan Lookup for {ip}",
+    "ports": "Port Scan for {ip}",
+    "services": "Services for {ip}",
+    "tls": "TLS Certificates for {ip}",
+}
+HOST_RESULT_FIELDS = {"geolocation": "geolocation", "my_api_geolocation": "my_api_geolocation", "shodan": "shodan", "services": "services", "tls": "tls"}
+HOST_SECTION_DISPLAYS = {"services": show_services}
+
+# Pipeline events that only report progress and aren't replayed
+PROGRESS_SECTIONS = ("scan_progress", "subdomains_progress")
+
+PAGE_SECTION_TITLES = {
+    "phone": ("Auto Phone Number OSINT", st.write),
+    "email": ("Auto Email OSINT", st.write),
+    "technology": ("Technology Detection", st.json),
+    "os": ("Operating System Detection", st.write),
+    "domain_info": ("Domain Information Gathering", st.json),
+    "crawl": ("Site Crawl", st.json),
+    "virustotal": ("VirusTotal Lookup", st.json),
+}
+PAGE_RESULT_KEYS = {
+    "phone": "Phone Number",
+    "email": "Emails",
+    "technology": "Technology Info",
+    "os": "Operating System",
+    "domain_info": "Extra Domain Info",
+    "crawl": "Site Crawl",
+    "virustotal": "Virus Total Info",
+}
+
+
+def render_pending(placeholder, title):
+    with placeholder.container():
+        st.subheader(title)
+        st.caption("Loading...")
+
+
+def render_result(placeholder, title, data, display=st.json, show_message=False):
+    with placeholder.container():
+        st.subheader(title)
+        if "error" in data:
+            st.error(data["error"])
+        elif show_message and "message" in data:
+            st.write(data["message"])
+        else:
+            display(data)
+
+def render_page_section(results, placeholders, section, data):
+    title, display = PAGE_SECTION_TITLES[section]
+    results.page[PAGE_RESULT_KEYS[section]] = data
+    render_result(placeholders[section], title, data, display, show_message=section in ("phone", "email"))
+
 # Main app functionality
 st.markdown(
     """
@@ -141,207 +221,95 @@ domain = st.text_input('Enter domain for analysis or ip address:')
 
 if domain:
     tab1, tab2, tab3 = st.tabs(["Domain/IP Info", "Extra Info", "Export"])
-
+    # A finished analysis is kept for the session, so the reruns the export
+    # widgets trigger replay it instead of scanning and looking up again
+    analyses = st.session_state.setdefault("analyses", {})
+    stored = analyses.get(domain)
+    results = stored["results"] if stored else TargetResults(domain)
+
+    # Placeholders are laid out up front in display order and filled in as
+    # the concurrent lookups finish.
     with tab1:
-        st.subheader("WHOIS Lookup")
-        whois_data = whois_lookup(domain)
-        if "error" in whois_data:
-            st.error(whois_data["error"])
-        else:
-            st.json(whois_data)
-        st.subheader("WHOIS Lookup (My API)")
-        my_api_whois_data = my_api_whois(domain)
-        if "error" in my_api_whois_data:
-            st.error(my_api_whois_data["error"])
-        else:
-            st.json(my_api_whois_data)
-
-        st.subheader("DNS Lookup")
-        dns_data = dns_lookup(domain)
-        if "error" in dns_data:
-            st.error(dns_data["error"])
-        else:
-            st.write(dns_data)
-
-        st.subheader("Subdomain Enumeration")
-        subdomains = subdomain_lookup(domain)
-        if "error" in subdomains:
-            st.error(subdomains["error"])
-        else:
-            st.write(subdomains)
-
-        st.subheader("SSL Certificate Information")
-        ssl_info = my_api_ssl(domain)
-        if "error" in ssl_info:
-            st.error(ssl_info["error"])
-        else:
-            st.json(ssl_info)
-
-        if isinstance(dns_data, list):
-            for ip in dns_data:
-                st.subheader(f"Geolocation for {ip}")
-                geo_data = get_geolocation(ip)
-                if "error" in geo_data:
-                    st.error(geo_data["error"])
-                else:
-                    st.json(geo_data)
-
-                st.subheader(f"Geolocation (My API) for {ip}")
-                my_api_geo_data = my_api_geoip(ip)
-                if "error" in my_api_geo_data:
-                   st.error(my_api_geo_data["error"])
-                else:
-                   st.json(my_api_geo_data)
-
-                st.subheader(f"Shodan Lookup for {ip}")
-                shodan_data = shodan_lookup(ip)
-                if "error" in shodan_data:
-                    st.error(shodan_data["error"])
-                else:
-                    st.json(shodan_data)
-
-                st.subheader(f"Port Scan for {ip}")
-                start_port = 1
-                end_port = 65535
-                progress_bar_placeholder = st.empty()
-                def progress_callback(progress):
-                    animation_html = get_neon_loading_animation(progress)
-                    progress_bar_placeholder.markdown(animation_html, unsafe_allow_html=True)
-                ports = asyncio.run(async_port_scan(ip, start_port, end_port, progress_callback=progress_callback))  # Use the async scan
-                progress_bar_placeholder.empty()
-                formatted_output = format_port_output(ports)
-                st.markdown(formatted_output, unsafe_allow_html=True)
-
-                fig = visualize_ports(ports, start_port, end_port)
-                if fig: 
-                    st.plotly_chart(fig, key=ip)
-    with tab2:
-        if domain.startswith("http"):
-            st.subheader("Auto Phone Number OSINT")
-            phone_data = my_api_phone(domain)
-            if "error" in phone_data:
-                st.error(phone_data["error"])
-            elif "message" in phone_data:
-                st.write(phone_data["message"])
-            else:
-              st.write(phone_data)
-            st.subheader("Auto Email OSINT")
-            email_data = my_api_email(domain)
-            if "error" in email_data:
-                st.error(email_data["error"])
-            elif "message" in email_data:
-                st.write(email_data["message"])
-            else:
-                st.write(email_data)
-
-            st.subheader("Technology Detection")
-            tech_data = technology_detection(domain)
-            if "error" in tech_data:
-                st.error(tech_data["error"])
-            else:
-                st.json(tech_data)
-
-            st.subheader("Operating System Detection")
-            os_info = os_detection(domain)
-            if "error" in os_info:
-                st.error(os_info["error"])
-            else:
-                st.write(os_info)
-
-            st.subheader("Domain Information Gathering")
-            domain_extra_info = gather_domain_info(domain)
-            if "error" in domain_extra_info:
-                st.error(domain_extra_info["error"])
-            else:
-                st.json(domain_extra_info)
-
-            st.subheader("VirusTotal Lookup")
-            virustotal_data = virustotal_lookup(domain)
-            if "error" in virustotal_data:
-                st.error(virustotal_data["error"])
-            else:
-                st.json(virustotal_data)
+        domain_placeholders = {section: st.empty() for section in DOMAIN_SECTION_TITLES}
+        for section, title in DOMAIN_SECTION_TITLES.items():
+            render_pending(domain_placeholders[section], title)
+        progress_bar_placeholder = st.empty()
+    page_placeholders = {}
+    if domain.startswith("http"):
+        with tab2:
+            page_placeholders = {section: st.empty() for section in PAGE_SECTION_TITLES}
+            for section, (title, _) in PAGE_SECTION_TITLES.items():
+                render_pending(page_placeholders[section], title)
+
+    start_port = 1
+    end_port = 65535
+    host_placeholders = {}
+    if stored:
+        events = stored["events"]
+    else:
+        events = run_analysis(domain, subdomain_lookup, domain.startswith("http"), start_port, end_port)
+    recorded = []
+    for section, ip, data in events:
+        if section not in PROGRESS_SECTIONS:
+            recorded.append((section, ip, data))
+        if section == "scan_progress":
+            progress_bar_placeholder.markdown(get_neon_loading_animation(data), unsafe_allow_html=True)
+        elif section == "subdomains_progress":
+            with domain_placeholders["subdomains"].container():
+                st.subheader(DOMAIN_SECTION_TITLES["subdomains"])
+                st.caption(f"Enumerating... {len(data)} found so far")
+                st.write(data)
+        elif section in DOMAIN_SECTION_TITLES:
+            setattr(results, DOMAIN_RESULT_FIELDS[section], data)
+            render_result(domain_placeholders[section], DOMAIN_SECTION_TITLES[section], data, st.write if section in ("dns", "subdomains") else st.json)
+            if section == "dns" and isinstance(data, list):
+                with tab1:
+                    for resolved_ip in data:
+                        results.host(resolved_ip)
+                        host_placeholders[resolved_ip] = {host_section: st.empty() for host_section in HOST_SECTION_TITLES}
+                        for host_section, title in HOST_SECTION_TITLES.items():
+                            render_pending(host_placeholders[resolved_ip][host_section], title.format(ip=resolved_ip))
+        elif section in HOST_RESULT_FIELDS:
+            setattr(results.host(ip), HOST_RESULT_FIELDS[section], data)
+            render_result(host_placeholders[ip][section], HOST_SECTION_TITLES[section].format(ip=ip), data, HOST_SECTION_DISPLAYS.get(section, st.json))
+        elif section == "ports":
+            progress_bar_placeholder.empty()
+            for scanned_ip, placeholders in host_placeholders.items():
+                if "error" in data:
+                    render_result(placeholders["ports"], f"Port Scan for {scanned_ip}", data)
+                    continue
+                ports = results.host(scanned_ip).open_ports = data.get(scanned_ip, [])
+                with placeholders["ports"].container():
+                    st.subheader(f"Port Scan for {scanned_ip}")
+                    st.markdown(format_port_output(ports), unsafe_allow_html=True)
+                    fig = visualize_ports(ports, start_port, end_port)
+                    if fig:
+                        st.plotly_chart(fig, key=scanned_ip)
+        elif section == "page":
+            for page_section in PAGE_RESULT_KEYS:
+                if page_section in data:
+                    render_page_section(results, page_placeholders, page_section, data[page_section])
+                elif "error" in data and page_section not in PAGE_LOOKUPS:
+                    # Sections with a lookup of their own report their own errors
+                    render_page_section(results, page_placeholders, page_section, data)
+        elif section in PAGE_SECTION_TITLES:
+            render_page_section(results, page_placeholders, section, data)
+
+    if not stored:
+        analyses[domain] = {"results": results, "events": recorded}
 
     with tab3:
         st.subheader("Export Data")
+        # Exports serialise what the tabs above already collected
         if st.button("Generate Report"):
-            report_data = {
-                "WHOIS": whois_data,
-                "WHOIS (My API)" : my_api_whois_data,
-                "Subdomains": subdomains,
-                "SSL Info": ssl_info,
-                "DNS Data": dns_data,
-            }
-            if isinstance(dns_data, list):
-                for ip in dns_data:
-                    geo_data = get_geolocation(ip)
-                    if isinstance(geo_data, dict):
-                        report_data[f"Geolocation for {ip}"] = geo_data
-                    my_api_geo_data = my_api_geoip(ip)
-                    if isinstance(my_api_geo_data,dict):
-                      report_data[f"Geolocation (My API) for {ip}"] = my_api_geo_data
-                    shodan_data = shodan_lookup(ip)
-                    if isinstance(shodan_data,dict):
-                        report_data[f"Shodan Data for {ip}"] = shodan_data
-                    ports = asyncio.run(async_port_scan(ip, 1, 1024))
-                    if ports:
-                        report_data[f"Open Ports for {ip}"] = ports
-            if domain.startswith('http'):
-                report_data["Phone Number"] = phone_data
-                report_data["Emails"] = email_data
-                report_data["Technology Info"] = tech_data
-                report_data["Operating System"] = os_info
-                report_data["Extra Domain Info"] = domain_extra_info
-                report_data["Virus Total Info"] = virustotal_data
-
-            report_path = generate_report(report_data, "OSINT_Report.pdf")
+            report_path = generate_report(results, "OSINT_Report.pdf")
             if "error" in report_path:
               st.error(report_path["error"])
             else:
                 st.success(report_path)
 
         if st.checkbox("Export to CSV"):
-                full_data = []
-                if isinstance(dns_data, list):
-                    for ip in dns_data:
-                        geo_data = get_geolocation(ip)
-                        my_api_geo_data = my_api_geoip(ip)
-                        shodan_data = shodan_lookup(ip)
-                        ports = asyncio.run(async_port_scan(ip, 1, 1024))
-                        data_for_df = {
-                            "Domain": domain,
-                            "IP": ip,
-                            "WHOIS": whois_data,
-                            "WHOIS (My API)" : my_api_whois_data,
-                            "Subdomains": subdomains,
-                            "SSL Info": ssl_info,
-                            "DNS Data": dns_data,
-                            "Geolocation": geo_data,
-                            "Geolocation (My API)" : my_api_geo_data,
-                            "Shodan Data" : shodan_data,
-                            "Open Ports": ports,
-                        }
-                        full_data.append(data_for_df)
-                else:
-                  data_for_df = {
-                            "Domain": domain,
-                            "WHOIS": whois_data,
-                            "WHOIS (My API)" : my_api_whois_data,
-                            "Subdomains": subdomains,
-                            "SSL Info": ssl_info,
-                            "DNS Data": dns_data,
-                        }
-                  full_data.append(data_for_df)
-                if domain.startswith('http'):
-                    for data_dic in full_data:
-                        data_dic["Phone Number"] = phone_data
-                        data_dic["Emails"] = email_data
-                        data_dic["Technology Info"] = tech_data
-                        data_dic["Operating System"] = os_info
-                        data_dic["Extra Domain Info"] = domain_extra_info
-                        data_dic["Virus Total Info"] = virustotal_data
-
-                df = create_pandas_dataframe(full_data)
+                df = create_pandas_dataframe(results)
                 if df is not None:
                   st.download_button(
                       label="Download CSV",
@@ -359,6 +327,15 @@ if domain:
 
 def automated_task():
     print("Running scheduled task...")
+    for monitored_domain in MONITORED_DOMAINS:
+        try:
+            new_subdomains = monitor_domain(monitored_domain)
+        except (httpx.HTTPError, requests.exceptions.RequestException, json.JSONDecodeError) as e:
+            print(f"Subdomain check for {monitored_domain} failed: {e}")
+            continue
+        print(f"{monitored_domain}: {len(new_subdomains)} new subdomain(s)")
+        for name in new_subdomains:
+            print(f"  {name}")
 
 
 schedule.every().day.at("00:00").do(automated_task)
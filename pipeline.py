@@ -0,0 +1,159 @@
+import asyncio
+import concurrent.futures
+import time
+
+from config import LOOKUP_TIMEOUTS, PIPELINE_WORKERS
+from core_functions import whois_lookup, dns_lookup, dns_records_lookup
+from async_utils import async_batch_port_scan
+from utils import get_geolocation_bulk
+from extra_functions import analyze_page, crawl_site_lookup
+from tls_harvester import harvest_hosts
+from service_probe import probe_hosts
+from api_integration import shodan_lookup, virustotal_lookup, my_api_whois, my_api_geoip, my_api_ssl
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = get_script_run_ctx = None
+
+# How often the pipeline wakes up to check deadlines and scan progress
+POLL_INTERVAL = 0.1
+
+DOMAIN_LOOKUPS = {
+    "whois": whois_lookup,
+    "my_api_whois": my_api_whois,
+    "dns": dns_lookup,
+    "dns_records": dns_records_lookup,
+    "ssl": my_api_ssl,
+}
+
+# "page" fetches and parses the URL once and carries the phone, email,
+# technology, os and domain_info sections together. "crawl" follows the
+# site's links for site-wide contact details.
+PAGE_LOOKUPS = {
+    "page": analyze_page,
+    "crawl": crawl_site_lookup,
+    "virustotal": virustotal_lookup,
+}
+
+IP_LOOKUPS = {
+    "my_api_geolocation": my_api_geoip,
+    "shodan": shodan_lookup,
+}
+
+# Lookups that take every resolved IP at once and return {ip: result}
+BULK_IP_LOOKUPS = {
+    "geolocation": get_geolocation_bulk,
+}
+
+# Sections tracked with the whole IP list and reported one IP at a time.
+# "tls" and "services" run once the port scan is done so they can use the
+# open ports.
+BULK_SECTIONS = set(BULK_IP_LOOKUPS) | {"tls", "services"}
+
+
+def run_analysis(domain, subdomain_lookup=None, page_lookups=False, start_port=1, end_port=65535, timeouts=LOOKUP_TIMEOUTS, max_workers=PIPELINE_WORKERS):
+    # Runs every independent lookup for `domain` at once and yields
+    # (section, ip, result) as each one finishes. DNS gates the per-IP work:
+    # geolocation, Shodan and the port scan are submitted as soon as the
+    # A records arrive, and the TLS certificate harvest and service probes
+    # follow the scan. A lookup that overruns its timeout yields an error
+    # result instead of holding up the page. While the scan runs,
+    # ("scan_progress", None, fraction) events are yielded as well, and
+    # subdomains found so far arrive as ("subdomains_progress", None,
+    # {name: addresses}) before the enumeration finishes.
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    ctx = get_script_run_ctx(suppress_warning=True) if get_script_run_ctx else None
+    pending = {}
+    scan_progress = [0.0]
+    found_subdomains = {}
+    resolved_ips = []
+
+    def run_with_ctx(func, *args):
+        # Lets the lookups' own st.spinner calls reach the running session
+        if ctx is not None:
+            add_script_run_ctx(ctx=ctx)
+        return func(*args)
+
+    def submit(section, ip, func, *args):
+        future = executor.submit(run_with_ctx, func, *args)
+        pending[future] = (section, ip, time.monotonic() + timeouts[section])
+
+    def scan_ports(ips):
+        def progress_callback(progress):
+            scan_progress[0] = progress
+        return asyncio.run(async_batch_port_scan([(ip, start_port, end_port) for ip in ips], progress_callback=progress_callback))
+
+    for section, func in DOMAIN_LOOKUPS.items():
+        submit(section, None, func, domain)
+    if subdomain_lookup is not None:
+        submit("subdomains", None, subdomain_lookup, domain, found_subdomains.__setitem__)
+    if page_lookups:
+        for section, func in PAGE_LOOKUPS.items():
+            submit(section, None, func, domain)
+
+    reported_progress = 0.0
+    reported_subdomains = 0
+    try:
+        while pending:
+            done, _ = concurrent.futures.wait(pending, timeout=POLL_INTERVAL, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                section, ip, _ = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"error": f"Error during {section} lookup: {e}"}
+                if section == "dns" and isinstance(result, list):
+                    resolved_ips[:] = result
+                    for resolved_ip in result:
+                        for ip_section, func in IP_LOOKUPS.items():
+                            submit(ip_section, resolved_ip, func, resolved_ip)
+                    if result:
+                        for bulk_section, func in BULK_IP_LOOKUPS.items():
+                            submit(bulk_section, result, func, result)
+                        submit("ports", None, scan_ports, result)
+                if section == "ports":
+                    if "error" in result:
+                        submit("tls", resolved_ips, harvest_hosts, resolved_ips, None, domain)
+                        for resolved_ip in resolved_ips:
+                            yield "services", resolved_ip, {"error": "Service probes skipped: the port scan failed"}
+                    else:
+                        submit("tls", resolved_ips, harvest_hosts, resolved_ips, result, domain)
+                        submit("services", resolved_ips, probe_hosts, resolved_ips, result, domain)
+                if section in BULK_SECTIONS:
+                    # Bulk lookups are tracked with the whole IP list and
+                    # reported to the caller one IP at a time
+                    for bulk_ip in ip:
+                        yield section, bulk_ip, result if "error" in result else result[bulk_ip]
+                    continue
+                yield section, ip, result
+
+            now = time.monotonic()
+            for future, (section, ip, deadline) in list(pending.items()):
+                if now >= deadline:
+                    del pending[future]
+                    future.cancel()
+                    if section == "subdomains" and found_subdomains:
+                        # Keep whatever was enumerated before the deadline
+                        yield section, ip, dict(found_subdomains)
+                        continue
+                    error = {"error": f"{section} lookup timed out after {timeouts[section]} seconds"}
+                    for timed_out_ip in (ip if section in BULK_SECTIONS else [ip]):
+                        yield section, timed_out_ip, error
+                    if section == "ports":
+                        # Without scan results the harvest falls back to the
+                        # default TLS ports, but there is nothing to probe
+                        submit("tls", resolved_ips, harvest_hosts, resolved_ips, None, domain)
+                        for resolved_ip in resolved_ips:
+                            yield "services", resolved_ip, {"error": "Service probes skipped: the port scan timed out"}
+
+            if scan_progress[0] != reported_progress:
+                reported_progress = scan_progress[0]
+                yield "scan_progress", None, reported_progress
+            if len(found_subdomains) != reported_subdomains and any(section == "subdomains" for section, _, _ in pending.values()):
+                reported_subdomains = len(found_subdomains)
+                yield "subdomains_progress", None, dict(found_subdomains)
+    finally:
+        # Overrunning lookups keep running in the background (and still
+        # populate the cache) but no longer block the caller.
+        executor.shutdown(wait=False)
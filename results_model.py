@@ -0,0 +1,80 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class HostResults:
+    ip: str
+    geolocation: dict = None
+    my_api_geolocation: dict = None
+    shodan: dict = None
+    open_ports: list = field(default_factory=list)
+    services: dict = None
+    tls: dict = None
+
+
+@dataclass
+class TargetResults:
+    # Everything collected for one analysed target. It is filled in once
+    # while the tabs render, and the exports serialise from it, so they
+    # never hit the network again.
+    domain: str
+    whois: object = None
+    my_api_whois: object = None
+    dns: object = None
+    dns_records: object = None
+    subdomains: object = None
+    ssl_info: object = None
+    hosts: dict = field(default_factory=dict)
+    page: dict = field(default_factory=dict)
+
+    def host(self, ip):
+        if ip not in self.hosts:
+            self.hosts[ip] = HostResults(ip)
+        return self.hosts[ip]
+
+    def _domain_data(self):
+        return {
+            "WHOIS": self.whois,
+            "WHOIS (My API)": self.my_api_whois,
+            "Subdomains": self.subdomains,
+            "SSL Info": self.ssl_info,
+            "DNS Data": self.dns,
+            "DNS Records": self.dns_records,
+        }
+
+    def to_report_data(self):
+        report_data = self._domain_data()
+        for ip, host in self.hosts.items():
+            if isinstance(host.geolocation, dict):
+                report_data[f"Geolocation for {ip}"] = host.geolocation
+            if isinstance(host.my_api_geolocation, dict):
+                report_data[f"Geolocation (My API) for {ip}"] = host.my_api_geolocation
+            if isinstance(host.shodan, dict):
+                report_data[f"Shodan Data for {ip}"] = host.shodan
+            if host.open_ports:
+                report_data[f"Open Ports for {ip}"] = host.open_ports
+            if host.services:
+                report_data[f"Services for {ip}"] = host.services
+            if host.tls:
+                report_data[f"TLS Certificates for {ip}"] = host.tls
+        report_data.update(self.page)
+        return report_data
+
+    def to_rows(self):
+        if not self.hosts:
+            return [{"Domain": self.domain, **self._domain_data(), **self.page}]
+        rows = []
+        for ip, host in self.hosts.items():
+            rows.append({
+                "Domain": self.domain,
+                "IP": ip,
+                **self._domain_data(),
+                "Geolocation": host.geolocation,
+                "Geolocation (My API)": host.my_api_geolocation,
+                "Shodan Data": host.shodan,
+                "Open Ports": host.open_ports,
+                "Services": host.services,
+                "TLS Certificates": host.tls,
+                **self.page,
+            })
+        return rows
@@ -0,0 +1,45 @@
+import threading
+
+# Aggressiveness presets, loosely modelled on nmap's -T0..-T5 templates.
+# Timeouts are in seconds; max_retries is how many times a probe that got
+# no answer at all (neither SYN/ACK nor RST) is sent again.
+TIMING_TEMPLATES = {
+    "paranoid": {"initial_timeout": 5.0, "min_timeout": 1.0, "max_timeout": 10.0, "max_retries": 3},
+    "sneaky": {"initial_timeout": 3.0, "min_timeout": 0.5, "max_timeout": 10.0, "max_retries": 3},
+    "polite": {"initial_timeout": 1.5, "min_timeout": 0.2, "max_timeout": 10.0, "max_retries": 2},
+    "normal": {"initial_timeout": 1.0, "min_timeout": 0.1, "max_timeout": 5.0, "max_retries": 1},
+    "aggressive": {"initial_timeout": 0.5, "min_timeout": 0.1, "max_timeout": 1.25, "max_retries": 1},
+    "insane": {"initial_timeout": 0.25, "min_timeout": 0.05, "max_timeout": 0.3, "max_retries": 0},
+}
+
+
+def get_timing_template(name):
+    if name not in TIMING_TEMPLATES:
+        raise ValueError(f"Unknown timing template '{name}'. Choose one of: {', '.join(TIMING_TEMPLATES)}")
+    return TIMING_TEMPLATES[name]
+
+
+class RttTimer:
+    # Per-host retransmission timer. Every answered probe (open or refused)
+    # is an RTT sample; the timeout follows the RFC 6298 estimator
+    # srtt + 4 * rttvar, clamped to the template's bounds.
+
+    def __init__(self, timing="normal"):
+        template = get_timing_template(timing) if isinstance(timing, str) else timing
+        self.min_timeout = template["min_timeout"]
+        self.max_timeout = template["max_timeout"]
+        self.max_retries = template["max_retries"]
+        self.timeout = template["initial_timeout"]
+        self.srtt = None
+        self.rttvar = None
+        self._lock = threading.Lock()
+
+    def record(self, rtt):
+        with self._lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+                self.srtt = 0.875 * self.srtt + 0.125 * rtt
+            self.timeout = min(self.max_timeout, max(self.min_timeout, self.srtt + 4 * self.rttvar))
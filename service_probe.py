@@ -0,0 +1,218 @@
+import asyncio
+import contextlib
+import re
+import ssl
+
+from config import PROBE_TIMEOUT, PROBE_BANNER_WAIT, PROBE_CONCURRENCY, PROBE_MAX_BYTES, CRAWL_USER_AGENT
+from async_utils import iter_windowed
+from tls_harvester import ssl_context, parse_certificate
+
+# Ports whose services expect a TLS ClientHello first, so the TLS probe is
+# tried before the plaintext one
+TLS_FIRST_PORTS = frozenset((443, 465, 636, 853, 990, 992, 993, 994, 995, 5061, 8443))
+
+# Services that greet the client as soon as it connects. FTP and SMTP both
+# open with 220, so FTP is told apart by its banner and anything else is
+# confirmed as SMTP with an EHLO.
+BANNER_SIGNATURES = (
+    ("ssh", re.compile(rb"SSH-[\d.]+-([^\r\n]*)")),
+    ("ftp", re.compile(rb"220[ -]([^\r\n]*FTP[^\r\n]*)", re.IGNORECASE)),
+    ("smtp", re.compile(rb"220[ -]([^\r\n]*)")),
+    ("pop3", re.compile(rb"\+OK ?([^\r\n]*)")),
+    ("imap", re.compile(rb"\* (?:OK|PREAUTH) ?([^\r\n]*)")),
+    ("mysql", re.compile(rb".{3}\x00\x0a([^\x00]{1,64})\x00", re.DOTALL)),
+)
+
+# Last line of a (possibly multi-line) SMTP reply
+SMTP_FINAL_LINE_REGEX = re.compile(rb"^\d{3}(?: [^\r\n]*)?\r?\n", re.MULTILINE)
+
+HTTP_SERVER_REGEX = re.compile(rb"^Server:[ \t]*([^\r\n]*)", re.IGNORECASE | re.MULTILINE)
+
+# A TLS alert record, which is how a TLS-only service answers plaintext
+TLS_ALERT_PREFIX = b"\x15\x03"
+
+
+def _printable(data):
+    # First line of a reply, with control and non-ASCII bytes escaped
+    line = data.split(b"\n", 1)[0].rstrip(b"\r")
+    return line[:256].decode("latin-1").encode("unicode_escape").decode("ascii")
+
+
+async def _read_reply(reader, timeout, complete):
+    # Reads until complete(data) holds, the peer closes, PROBE_MAX_BYTES
+    # have arrived or `timeout` passes. A service that stays silent gives b"".
+    data = b""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while len(data) < PROBE_MAX_BYTES and not complete(data):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            chunk = await asyncio.wait_for(reader.read(PROBE_MAX_BYTES - len(data)), remaining)
+        except (asyncio.TimeoutError, ConnectionResetError):
+            break
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def _has_line(data):
+    return b"\n" in data
+
+
+def _has_headers(data):
+    return b"\r\n\r\n" in data or b"\n\n" in data
+
+
+def _http_request(host, server_hostname):
+    host_header = server_hostname or (f"[{host}]" if ":" in host else host)
+    return f"HEAD / HTTP/1.1\r\nHost: {host_header}\r\nUser-Agent: {CRAWL_USER_AGENT}\r\nConnection: close\r\n\r\n".encode()
+
+
+def _http_result(reply):
+    result = {"service": "http", "banner": _printable(reply)}
+    server = HTTP_SERVER_REGEX.search(reply)
+    if server:
+        result["product"] = server.group(1).decode("latin-1").strip()
+    return result
+
+
+async def _confirm_smtp(result, reader, writer, timeout):
+    # Adds the EHLO extensions (STARTTLS among them) to a 220 greeting
+    writer.write(b"EHLO probe.invalid\r\n")
+    await writer.drain()
+    reply = await _read_reply(reader, timeout, SMTP_FINAL_LINE_REGEX.search)
+    if reply.startswith(b"250"):
+        extensions = [line[4:].decode("latin-1").strip() for line in reply.splitlines()[1:] if line[:3] == b"250"]
+        result["extensions"] = extensions
+        result["starttls"] = any(extension.upper() == "STARTTLS" for extension in extensions)
+    writer.write(b"QUIT\r\n")
+    return result
+
+
+async def _identify_banner(banner, reader, writer, timeout):
+    for service, regex in BANNER_SIGNATURES:
+        match = regex.match(banner)
+        if match is None:
+            continue
+        product = match.group(1).decode("latin-1").strip()
+        # The MySQL greeting is a binary packet; its version string is the
+        # readable part
+        result = {"service": service, "banner": product if service == "mysql" else _printable(banner)}
+        if product:
+            result["product"] = product
+        if service == "smtp":
+            return await _confirm_smtp(result, reader, writer, timeout)
+        return result
+    if banner.startswith(TLS_ALERT_PREFIX):
+        return None
+    return {"service": "unknown", "banner": _printable(banner)}
+
+
+async def _converse(reader, writer, host, server_hostname, timeout, banner_wait):
+    # Waits briefly for a greeting, and sends an HTTP HEAD if there is
+    # none. Returns None when the reply suggests the port wants TLS.
+    banner = await _read_reply(reader, banner_wait, _has_line)
+    if banner:
+        return await _identify_banner(banner, reader, writer, timeout)
+    writer.write(_http_request(host, server_hostname))
+    await writer.drain()
+    reply = await _read_reply(reader, timeout, _has_headers)
+    if reply.startswith(b"HTTP/"):
+        # nginx and others answer plaintext on a TLS port with a 400 that says so
+        if reply[9:12] == b"400" and re.search(rb"https|ssl|tls", reply, re.IGNORECASE):
+            return None
+        return _http_result(reply)
+    if not reply or reply.startswith(TLS_ALERT_PREFIX):
+        return None
+    return {"service": "unknown", "banner": _printable(reply)}
+
+
+async def _probe(host, port, use_tls, server_hostname, timeout, banner_wait):
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(
+            host, port,
+            ssl=ssl_context() if use_tls else None,
+            server_hostname=(server_hostname or host) if use_tls else None,
+        ),
+        timeout,
+    )
+    try:
+        result = await _converse(reader, writer, host, server_hostname, timeout, banner_wait)
+        if not use_tls:
+            return result
+        ssl_object = writer.get_extra_info("ssl_object")
+        result = result or {"service": "tls"}
+        if result["service"] == "http":
+            result["service"] = "https"
+        result["tls_version"] = ssl_object.version()
+        der = ssl_object.getpeercert(True)
+        if der:
+            # A certificate cryptography can't parse still identifies the
+            # service; only its subject is left out
+            with contextlib.suppress(ValueError):
+                result["certificate_subject"] = parse_certificate(der)["Subject"]
+        return result
+    finally:
+        writer.transport.abort()
+
+
+async def probe_service(host, port, server_hostname=None, timeout=PROBE_TIMEOUT, banner_wait=PROBE_BANNER_WAIT):
+    # Identifies what listens on host:port from its greeting, or from its
+    # answer to an HTTP HEAD, in plaintext and over TLS. Returns
+    # {"service", "banner", "product", ...}; "service" is "unknown" if the
+    # port accepted connections but nothing matched.
+    attempts = (True, False) if port in TLS_FIRST_PORTS else (False, True)
+    connected = False
+    error = None
+    for use_tls in attempts:
+        try:
+            result = await _probe(host, port, use_tls, server_hostname, timeout, banner_wait)
+            connected = True
+        except ssl.SSLError:
+            # The handshake failed, so something did answer
+            connected = True
+            continue
+        except asyncio.TimeoutError:
+            error = "Connection timed out"
+            continue
+        except OSError as e:
+            error = str(e)
+            continue
+        if result is not None:
+            return result
+    if connected:
+        return {"service": "unknown"}
+    return {"error": f"Could not connect to {host}:{port}: {error}"}
+
+
+async def iter_probe(endpoints, concurrency=PROBE_CONCURRENCY, timeout=PROBE_TIMEOUT, banner_wait=PROBE_BANNER_WAIT):
+    # Probes (host, port) or (host, port, server_hostname) endpoints from a
+    # sync or async iterable with at most `concurrency` probes in flight.
+    # Yields ((host, port), result) as each finishes.
+    async def probe(endpoint):
+        host, port, *server_hostname = endpoint
+        return (host, port), await probe_service(host, port, server_hostname[0] if server_hostname else None, timeout, banner_wait)
+
+    async with contextlib.aclosing(iter_windowed(endpoints, probe, concurrency)) as results:
+        async for result in results:
+            yield result
+
+
+def probe(endpoints, concurrency=PROBE_CONCURRENCY, timeout=PROBE_TIMEOUT, banner_wait=PROBE_BANNER_WAIT):
+    async def collect():
+        return {endpoint: result async for endpoint, result in iter_probe(endpoints, concurrency, timeout, banner_wait)}
+    return asyncio.run(collect())
+
+
+def probe_hosts(ips, open_ports=None, server_hostname=None):
+    # Service identification for every port the scan found open, as
+    # {ip: {port: result}}
+    open_ports = open_ports or {}
+    endpoints = [(ip, port, server_hostname) for ip in ips for port in open_ports.get(ip, [])]
+    services = {ip: {} for ip in ips}
+    for (ip, port), result in sorted(probe(endpoints).items()):
+        services[ip][port] = result
+    return services
@@ -0,0 +1,215 @@
+import asyncio
+import codecs
+import json
+import threading
+import time
+
+import http_client
+from cache_utils import DigestSet
+from config import CRT_SH_URL, CRT_SH_CHUNK_SIZE, DNS_CONCURRENCY
+from dns_resolver import ADDRESS_TYPES, iter_resolve_many
+from subdomain_index import open_subdomain_index
+
+
+_index = None
+_index_opened = False
+_index_lock = threading.Lock()
+
+
+def get_index():
+    # The shared index is opened on first use rather than at import, so
+    # importing this module doesn't create SUBDOMAIN_INDEX_PATH. None when
+    # the index is disabled.
+    global _index, _index_opened
+    with _index_lock:
+        if not _index_opened:
+            _index = open_subdomain_index()
+            _index_opened = True
+    return _index
+
+
+class JsonArrayStream:
+    # Incremental parser for a top-level JSON array such as crt.sh's
+    # output. Bytes are fed in as they arrive and every complete element
+    # is returned straight away, so only the unparsed tail of the
+    # download is ever held in memory.
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = ""
+        self._started = False
+        self.finished = False
+
+    def feed(self, chunk):
+        self._buffer += self._text.decode(chunk)
+        items = []
+        pos = 0
+        buffer = self._buffer
+        while not self.finished:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not self._started:
+                if buffer[pos] != "[":
+                    raise json.JSONDecodeError("Expected a JSON array", buffer, pos)
+                self._started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                self.finished = True
+                pos += 1
+                break
+            try:
+                item, pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The element continues in the next chunk
+                break
+            items.append(item)
+        self._buffer = buffer[pos:]
+        return items
+
+    def close(self):
+        if not self.finished:
+            raise json.JSONDecodeError("Unterminated JSON array", self._buffer, 0)
+
+
+def normalize_name(name, domain):
+    # Lowercases a certificate name and strips wildcards and the trailing
+    # dot. Names outside `domain` or containing characters that can't be
+    # in a hostname (e-mail SANs, free text) return None.
+    name = name.strip().lower().rstrip(".")
+    while name.startswith("*."):
+        name = name[2:]
+    if name != domain and not name.endswith("." + domain):
+        return None
+    if not all(label and len(label) <= 63 and label.replace("-", "").replace("_", "").isalnum() for label in name.split(".")):
+        return None
+    return name
+
+
+class CrtShEnumeration:
+    # One crt.sh download for `domain`. With an index, names already known
+    # are served from it first, certificates at or below the last fully
+    # synced ID (or already stored) are skipped, and only unexpired
+    # certificates are requested once the domain has been synced, since
+    # anything logged after the last run can't have expired yet.
+
+    def __init__(self, domain, index=None):
+        self.domain = domain.strip().lower().rstrip(".")
+        self.index = index
+        self.seen = DigestSet()
+        self.after_id = index.last_cert_id(self.domain) if index is not None else None
+        self.highest_id = self.after_id or 0
+        self._parser = JsonArrayStream()
+
+    @property
+    def url(self):
+        url = f"{CRT_SH_URL.rstrip('/')}/?q=%25.{self.domain}&output=json"
+        if self.after_id is not None:
+            url += "&exclude=expired"
+        return url
+
+    def known_names(self):
+        if self.index is None:
+            return
+        for name in self.index.names(self.domain):
+            if self.seen.add(name):
+                yield name
+
+    def entry_names(self, entry):
+        # crt.sh's name_value holds every SAN of a certificate separated by
+        # newlines; common_name is usually one of them but not always.
+        names = {}
+        for field in ("name_value", "common_name"):
+            for raw_name in (entry.get(field) or "").split("\n"):
+                name = normalize_name(raw_name, self.domain)
+                if name:
+                    names[name] = None
+        return list(names)
+
+    def feed(self, chunk):
+        # Returns the names first seen in this chunk
+        new_names = []
+        for entry in self._parser.feed(chunk):
+            cert_id = entry.get("id")
+            names = self.entry_names(entry)
+            if self.index is not None and isinstance(cert_id, int):
+                if (self.after_id is not None and cert_id <= self.after_id) or self.index.has_certificate(self.domain, cert_id):
+                    continue
+                self.highest_id = max(self.highest_id, cert_id)
+                self.index.add_certificate(self.domain, cert_id, names)
+            new_names.extend(name for name in names if self.seen.add(name))
+        if self.index is not None:
+            self.index.commit()
+        return new_names
+
+    def finish(self):
+        self._parser.close()
+        if self.index is not None:
+            self.index.mark_synced(self.domain, self.highest_id)
+
+
+def iter_subdomains(domain, chunk_size=CRT_SH_CHUNK_SIZE, index=None):
+    # Yields each distinct subdomain of `domain` from crt.sh as soon as the
+    # certificate naming it has been downloaded.
+    enumeration = CrtShEnumeration(domain, index)
+    yield from enumeration.known_names()
+    with http_client.get(enumeration.url, stream=True, timeout=(10, 60)) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size):
+            yield from enumeration.feed(chunk)
+    enumeration.finish()
+
+
+async def aiter_subdomains(domain, chunk_size=CRT_SH_CHUNK_SIZE, index=None):
+    # Async counterpart of iter_subdomains, using the event loop's pooled
+    # httpx client.
+    enumeration = CrtShEnumeration(domain, index)
+    for name in enumeration.known_names():
+        yield name
+    async with http_client.get_async_client().stream("GET", enumeration.url, timeout=60) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes(chunk_size):
+            for name in enumeration.feed(chunk):
+                yield name
+    enumeration.finish()
+
+
+def monitor_domain(domain, index=None):
+    # Brings the index up to date for `domain` and returns the subdomains
+    # first seen during this run. On a domain's first run that is all of
+    # them.
+    index = index or get_index()
+    if index is None:
+        return list(iter_subdomains(domain))
+    started = time.time()
+    for _ in iter_subdomains(domain, index=index):
+        pass
+    return index.names_since(domain.strip().lower().rstrip("."), started)
+
+
+async def iter_resolved_subdomains(domain, rdtypes=ADDRESS_TYPES, concurrency=DNS_CONCURRENCY, index=None):
+    # Resolves subdomains while crt.sh is still sending them and yields
+    # (name, records) as each answer comes back.
+    async for name, records in iter_resolve_many(aiter_subdomains(domain, index=index), rdtypes, concurrency):
+        yield name, records
+
+
+def resolve_subdomains(domain, callback=None, concurrency=DNS_CONCURRENCY, index=None):
+    # Returns {subdomain: [addresses]} with an empty list for names that no
+    # longer resolve. `callback(name, addresses)` sees each entry as soon
+    # as it is known.
+    async def collect():
+        subdomains = {}
+        try:
+            async for name, records in iter_resolved_subdomains(domain, concurrency=concurrency, index=index or get_index()):
+                addresses = [] if "error" in records else [address for values in records.values() for address in values]
+                subdomains[name] = addresses
+                if callback is not None:
+                    callback(name, addresses)
+        finally:
+            await http_client.close_async_client()
+        return subdomains
+    return asyncio.run(collect())
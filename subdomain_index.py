@@ -0,0 +1,96 @@
+import sqlite3
+import threading
+import time
+
+from config import SUBDOMAIN_INDEX_PATH
+
+
+class SubdomainIndex:
+    # On-disk record of every crt.sh certificate and subdomain seen per
+    # domain, so re-enumerating a domain only has to process certificates
+    # logged since the last complete download.
+
+    def __init__(self, db_path=SUBDOMAIN_INDEX_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS domains (
+                domain TEXT PRIMARY KEY,
+                last_cert_id INTEGER NOT NULL,
+                synced_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS certificates (
+                domain TEXT NOT NULL,
+                cert_id INTEGER NOT NULL,
+                PRIMARY KEY (domain, cert_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS subdomains (
+                domain TEXT NOT NULL,
+                name TEXT NOT NULL,
+                cert_id INTEGER NOT NULL,
+                first_seen REAL NOT NULL,
+                PRIMARY KEY (domain, name)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS subdomains_first_seen ON subdomains (domain, first_seen);
+        """)
+        self._db.commit()
+
+    def last_cert_id(self, domain):
+        # Highest certificate ID covered by a complete download, or None if
+        # the domain has never been fully enumerated
+        with self._lock:
+            row = self._db.execute("SELECT last_cert_id FROM domains WHERE domain = ?", (domain,)).fetchone()
+        return row[0] if row else None
+
+    def has_certificate(self, domain, cert_id):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM certificates WHERE domain = ? AND cert_id = ?", (domain, cert_id)).fetchone() is not None
+
+    def add_certificate(self, domain, cert_id, names):
+        # Records a certificate and returns the names it introduced
+        now = time.time()
+        new_names = []
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO certificates (domain, cert_id) VALUES (?, ?)", (domain, cert_id))
+            for name in names:
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO subdomains (domain, name, cert_id, first_seen) VALUES (?, ?, ?, ?)",
+                    (domain, name, cert_id, now),
+                )
+                if cursor.rowcount:
+                    new_names.append(name)
+        return new_names
+
+    def mark_synced(self, domain, last_cert_id):
+        # Called once a download has completed, so an interrupted first run
+        # is never mistaken for a full one
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO domains (domain, last_cert_id, synced_at) VALUES (?, MAX(?, COALESCE((SELECT last_cert_id FROM domains WHERE domain = ?), 0)), ?)",
+                (domain, last_cert_id, domain, time.time()),
+            )
+            self._db.commit()
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+
+    def names(self, domain):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT name FROM subdomains WHERE domain = ? ORDER BY name", (domain,))]
+
+    def names_since(self, domain, since):
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT name FROM subdomains WHERE domain = ? AND first_seen >= ? ORDER BY first_seen, name", (domain, since)
+            )]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_subdomain_index(path=SUBDOMAIN_INDEX_PATH):
+    if not path:
+        return None
+    return SubdomainIndex(path)
@@ -0,0 +1,102 @@
+import asyncio
+import contextlib
+
+from async_utils import iter_windowed, iter_open_ports
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def _tracked(delay=0.01):
+    state = {"running": 0, "peak": 0}
+
+    async def run(item):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        await asyncio.sleep(delay)
+        state["running"] -= 1
+        return item * 2
+
+    return run, state
+
+
+def test_sync_source_is_bounded_by_the_window():
+    run, state = _tracked()
+
+    async def collect():
+        return [result async for result in iter_windowed(range(50), run, 7)]
+
+    assert sorted(_run(collect())) == [item * 2 for item in range(50)]
+    assert state["peak"] == 7
+
+
+def test_async_source_is_consumed_while_it_produces():
+    run, state = _tracked()
+
+    async def produce():
+        for item in range(20):
+            await asyncio.sleep(0.001)
+            yield item
+
+    async def collect():
+        return [result async for result in iter_windowed(produce(), run, 5)]
+
+    assert sorted(_run(collect())) == [item * 2 for item in range(20)]
+    assert 1 < state["peak"] <= 5
+
+
+def test_closing_early_cancels_calls_in_flight():
+    cancelled = []
+
+    async def run(item):
+        try:
+            await asyncio.sleep(0 if item == 0 else 10)
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+        return item
+
+    async def first():
+        results = iter_windowed(range(100), run, 4)
+        result = await results.__anext__()
+        await results.aclose()
+        await asyncio.sleep(0)
+        return result, len(asyncio.all_tasks())
+
+    assert _run(first()) == (0, 1)
+    # Item 4 was scheduled when item 0 finished and is cancelled before it starts
+    assert sorted(cancelled) == [1, 2, 3]
+
+
+def test_iter_open_ports_finds_local_listeners():
+    async def scan():
+        servers = [await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0) for _ in range(2)]
+        ports = sorted(server.sockets[0].getsockname()[1] for server in servers)
+        progress = []
+        try:
+            found = [port async for port in iter_open_ports("127.0.0.1", ports[0], ports[-1], progress.append, concurrency=32)]
+        finally:
+            for server in servers:
+                server.close()
+        return ports, sorted(found), progress
+
+    ports, found, progress = _run(scan())
+    assert set(ports) <= set(found)
+    assert progress[-1] == 1.0
+
+
+def test_stopping_a_scan_early_cancels_its_probes():
+    async def scan():
+        server = await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with contextlib.aclosing(iter_open_ports("127.0.0.1", port, port + 200, concurrency=16)) as ports:
+                async for found in ports:
+                    break
+            await asyncio.sleep(0)
+            return found == port, len(asyncio.all_tasks())
+        finally:
+            server.close()
+
+    assert _run(scan()) == (True, 1)
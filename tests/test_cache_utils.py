@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from cache_utils import TTLCache, NotCached, cached, normalize_target
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("Example.COM.", "example.com"),
+    ("  www.Example.com ", "www.example.com"),
+    ("8.8.8.8", "8.8.8.8"),
+    ("2001:DB8::1", "2001:db8::1"),
+    ("HTTPS://Example.COM/Foo?Q=Bar", "https://example.com/Foo?Q=Bar"),
+    ("https://Example.com.:8443/Path", "https://example.com:8443/Path"),
+    ("John Smith", "John Smith"),
+    ("John@Example.com", "John@Example.com"),
+    ("+1 555 0100", "+1 555 0100"),
+    (["Example.com", "https://A.com/B"], ("example.com", "https://a.com/B")),
+])
+def test_normalize_target_only_folds_hosts(value, expected):
+    assert normalize_target(value) == expected
+
+
+def test_url_paths_get_their_own_cache_entries():
+    calls = []
+
+    @cached("web", TTLCache(db_path=""))
+    def fetch(url):
+        calls.append(url)
+        return {"url": url}
+
+    fetch("https://x.com/Foo")
+    fetch("https://X.com/Foo")
+    fetch("https://x.com/foo")
+    assert calls == ["https://x.com/Foo", "https://x.com/foo"]
+
+
+def test_not_cached_results_are_returned_but_not_stored():
+    calls = []
+
+    @cached("portscan", TTLCache(db_path=""))
+    async def scan(ip):
+        calls.append(ip)
+        return NotCached([22]) if len(calls) == 1 else [22, 80]
+
+    assert asyncio.run(scan("192.0.2.1")) == [22]
+    assert asyncio.run(scan("192.0.2.1")) == [22, 80]
+    assert asyncio.run(scan("192.0.2.1")) == [22, 80]
+    assert len(calls) == 2
@@ -0,0 +1,63 @@
+from crawler import crawl_site
+
+ROBOTS = b"User-agent: *\nDisallow: /private/\n"
+
+HOME = """<html><body>
+<p>Call +44 20 7946 0958 or write to info@example.org</p>
+<a href="/about">About</a>
+<a href="/about#team">Team</a>
+<a href="/private/staff">Staff</a>
+<a href="http://[::1">Broken IPv6 literal</a>
+<a href="http://127.0.0.1:99999/">Broken port</a>
+<a href="/{long_path}">Too long for the HTTP client</a>
+<a href="/logo.png">Logo</a>
+<a href="https://github.com/octocat">GitHub</a>
+<a href="https://elsewhere.example/">Off site</a>
+</body></html>"""
+
+ABOUT = """<html><body>
+<p>sales@example.org</p>
+<a href="/">Home</a>
+<a href="mailto:press@example.org">Press</a>
+</body></html>"""
+
+
+def _html(body):
+    return lambda method, path, request_body: (200, {"Content-Type": "text/html; charset=utf-8"}, body.encode())
+
+
+def _serve_site(stub_server):
+    stub_server.routes["/robots.txt"] = lambda method, path, body: (200, {"Content-Type": "text/plain"}, ROBOTS)
+    stub_server.routes["/"] = _html(HOME.format(long_path="a" * 70000))
+    stub_server.routes["/about"] = _html(ABOUT)
+    stub_server.routes["/private/staff"] = _html("<p>staff@example.org</p>")
+
+
+def test_crawl_skips_malformed_links_and_robots_exclusions(stub_server):
+    _serve_site(stub_server)
+
+    result = crawl_site(stub_server.url + "/")
+
+    requested = stub_server.paths()
+    assert sorted(requested) == ["/", "/about", "/robots.txt"]
+    assert result["skipped_by_robots"] == 1
+    # The over-long link fails inside the HTTP client; it is reported and
+    # the rest of the crawl carries on
+    assert result["pages_crawled"] == 3
+    assert len(result["errors"]) == 1
+    assert "URL too long" in result["errors"][0]
+    assert set(result["email"]) == {"info@example.org", "sales@example.org", "press@example.org"}
+    assert result["email"]["sales@example.org"] == stub_server.url + "/about"
+    assert list(result["social"]) == ["https://github.com/octocat"]
+    assert list(result["phone"]) == ["+442079460958"]
+
+
+def test_robots_server_error_disallows_everything(stub_server):
+    _serve_site(stub_server)
+    stub_server.routes["/robots.txt"] = lambda method, path, body: (503, {}, b"unavailable")
+
+    result = crawl_site(stub_server.url + "/")
+
+    assert stub_server.paths() == ["/robots.txt"]
+    assert result["pages_crawled"] == 0
+    assert result["skipped_by_robots"] == 1
@@ -0,0 +1,152 @@
+import asyncio
+import socketserver
+import threading
+import time
+
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.resolver
+import dns.rrset
+import pytest
+
+from dns_resolver import dns_cache, make_resolver, resolve_records, iter_resolve_many
+
+# name -> {rdtype: (ttl, [values])}; names missing here are NXDOMAIN
+ZONE = {
+    "multi.test.": {"A": (300, ["192.0.2.10"]), "AAAA": (300, ["2001:db8::10"]), "MX": (300, ["10 mail.multi.test."]), "TXT": (300, ['"v=spf1 -all"'])},
+    "short-ttl.test.": {"A": (1, ["192.0.2.20"])},
+    "a-only.test.": {"A": (300, ["192.0.2.30"])},
+    "one.test.": {"A": (300, ["192.0.2.1"])},
+    "two.test.": {"A": (300, ["192.0.2.2"])},
+}
+
+
+class StubNameserver:
+    # Authoritative-looking UDP nameserver for ZONE that records every
+    # question and answers after `delay` seconds, from its own thread
+    # per query so slow answers overlap.
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.queries = []
+        stub = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                data, sock = self.request
+                query = dns.message.from_wire(data)
+                question = query.question[0]
+                name = question.name.to_text()
+                rdtype = dns.rdatatype.to_text(question.rdtype)
+                stub.queries.append((name, rdtype))
+                time.sleep(stub.delay)
+                response = dns.message.make_response(query)
+                response.flags |= dns.flags.AA
+                if name not in ZONE:
+                    response.set_rcode(dns.rcode.NXDOMAIN)
+                elif rdtype in ZONE[name]:
+                    ttl, values = ZONE[name][rdtype]
+                    response.answer.append(dns.rrset.from_text_list(name, ttl, "IN", rdtype, values))
+                sock.sendto(response.to_wire(), self.client_address)
+
+        self.server = socketserver.ThreadingUDPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def resolver(self):
+        return make_resolver(["127.0.0.1"], self.port, timeout=2)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def nameserver():
+    server = StubNameserver()
+    yield server
+    server.close()
+
+
+@pytest.fixture(autouse=True)
+def empty_dns_cache():
+    dns_cache.flush()
+    yield
+    dns_cache.flush()
+
+
+def test_record_types_are_queried_in_parallel(nameserver):
+    nameserver.delay = 0.3
+    started = time.monotonic()
+    records = asyncio.run(resolve_records("multi.test", ("A", "AAAA", "MX", "TXT", "NS"), nameserver.resolver()))
+    elapsed = time.monotonic() - started
+
+    assert records == {
+        "A": ["192.0.2.10"],
+        "AAAA": ["2001:db8::10"],
+        "MX": ["10 mail.multi.test."],
+        "TXT": ['"v=spf1 -all"'],
+    }
+    assert len(nameserver.queries) == 5
+    assert elapsed < 1.0
+
+
+def test_answers_are_cached_for_their_ttl(nameserver):
+    resolver = nameserver.resolver()
+
+    for _ in range(3):
+        assert asyncio.run(resolve_records("short-ttl.test", ("A",), resolver)) == {"A": ["192.0.2.20"]}
+    assert nameserver.queries == [("short-ttl.test.", "A")]
+
+    time.sleep(1.2)
+    asyncio.run(resolve_records("short-ttl.test", ("A",), resolver))
+    assert nameserver.queries == [("short-ttl.test.", "A")] * 2
+
+
+def test_no_answer_types_are_left_out(nameserver):
+    records = asyncio.run(resolve_records("a-only.test", ("A", "AAAA", "MX"), nameserver.resolver()))
+    assert records == {"A": ["192.0.2.30"]}
+
+
+def test_nxdomain_raises_from_resolve_records(nameserver):
+    with pytest.raises(dns.resolver.NXDOMAIN):
+        asyncio.run(resolve_records("missing.test", ("A",), nameserver.resolver()))
+
+
+def test_resolve_many_reports_each_name(nameserver):
+    resolver = nameserver.resolver()
+
+    async def collect():
+        return {name: records async for name, records in iter_resolve_many(["one.test", "two.test", "missing.test", "one.test"], ("A",), 8, resolver)}
+
+    results = asyncio.run(collect())
+    assert results == {
+        "one.test": {"A": ["192.0.2.1"]},
+        "two.test": {"A": ["192.0.2.2"]},
+        "missing.test": {"error": "Domain does not exist"},
+    }
+    # The repeated name is resolved once
+    assert sorted(nameserver.queries) == [("missing.test.", "A"), ("one.test.", "A"), ("two.test.", "A")]
+
+
+def test_async_sources_are_resolved_while_they_produce(nameserver):
+    resolver = nameserver.resolver()
+    order = []
+
+    async def names():
+        for name in ("one.test", "two.test", "one.test"):
+            order.append(("produced", name))
+            yield name
+            await asyncio.sleep(0.2)
+
+    async def collect():
+        async for name, records in iter_resolve_many(names(), ("A",), 4, resolver):
+            order.append(("resolved", name))
+
+    asyncio.run(collect())
+    # one.test is resolved before the source produces two.test
+    assert order.index(("resolved", "one.test")) < order.index(("produced", "two.test"))
+    assert order.count(("resolved", "one.test")) == 1
@@ -0,0 +1,10 @@
+from extractors import extract
+
+
+def test_social_link_needs_a_profile_path():
+    text = "Code on github.com, see https://github.com/ or github.com/octocat and x.com/jack/ today"
+    assert extract(text)["social"] == ["https://github.com/octocat", "https://x.com/jack"]
+
+
+def test_social_host_must_end_at_com():
+    assert extract("visit github.community/topic and facebook.com.evil/x")["social"] == []
@@ -0,0 +1,130 @@
+import pytest
+
+from fingerprints import _BOUNDARY, _SEPARATOR, _UNKNOWN, FingerprintEngine, _pattern_items, index_token
+
+
+@pytest.mark.parametrize("source, items", [
+    (r"\bab$", [_BOUNDARY, ("literal", "a"), ("literal", "b"), _BOUNDARY]),
+    (r"\.\s\d", [("literal", "."), _SEPARATOR, _UNKNOWN]),
+    # Quantified literals may be absent or repeated
+    (r"ab?", [("literal", "a"), _UNKNOWN]),
+    (r"ab+c*", [("literal", "a"), _UNKNOWN, _UNKNOWN]),
+    (r"ab{2,3}", [("literal", "a"), _UNKNOWN]),
+    # Character classes
+    (r"[\"']", [_SEPARATOR]),
+    (r"[-.]", [_SEPARATOR]),
+    (r"[a-z]", [_UNKNOWN]),
+    (r"[^/]", [_UNKNOWN]),
+    (r"[\d.]", [_UNKNOWN]),
+    (r"[!-/]", [_UNKNOWN]),
+    # Groups, optional or not
+    (r"(?:\.min)", [("group", (True, False))]),
+    (r"(?:\.min)?", [("group", (True, True))]),
+    (r"(\.min)*", [("group", (True, True))]),
+    (r"(?:-x){0,1}", [("group", (True, True))]),
+    (r"(?:-x){1,2}", [("group", (True, False))]),
+    (r"(?P<v>/x)", [("group", (True, False))]),
+    (r"(?:\.min|-dev)", [("group", (True, False))]),
+    (r"(?:\.min|dev)", [("group", (False, False))]),
+    (r"(?:a(b)c)", [("group", (False, False))]),
+    # Lookarounds and inline flags
+    (r"(?=x)a", [_UNKNOWN, ("literal", "a")]),
+    (r"a(?<!x)", [("literal", "a"), _UNKNOWN]),
+    (r"(?i)a", [_UNKNOWN, ("literal", "a")]),
+    # Top-level alternation requires no literal at all
+    (r"a|b", None),
+    (r"(a|b)|c", None),
+    (r"[|]", [_SEPARATOR]),
+    (r"\|", [("literal", "|")]),
+])
+def test_pattern_items(source, items):
+    assert _pattern_items(source) == items
+
+
+@pytest.mark.parametrize("source, token", [
+    (r"/jquery\.js", "jquery"),
+    (r"^wordpress/", "wordpress"),
+    (r"\bwix\.com\b", "wix"),
+    (r"jquery\.js", None),
+    (r"/jquery", None),
+    # Optional groups are looked past only if they start with a separator
+    (r"/jquery(?:\.min)?\.js", "jquery"),
+    (r"/bootstrap(?:-([\d.]+))?(?:\.min)?\.js", "bootstrap"),
+    (r"/angular(?:\.min)\.js", "angular"),
+    (r"/react(?:dom)?\.js", None),
+    (r"/react(?:-dom|dom)?\.js", None),
+    (r"/react(?:\.min)?", None),
+    # Quantified literals
+    (r"/wp-contents?/", "wp"),
+    (r"/drupal{1,2}/", None),
+    (r"/next\.?js/", None),
+    # Character classes
+    (r"[\"']/modernizr[\"']", "modernizr"),
+    (r"[a-z]shopify\b", None),
+    (r"/[^/]*squarespace\.js", None),
+    (r"\sember[.,]", "ember"),
+    # Escapes inside a class are not inspected
+    (r"\sember[\s.]", None),
+    # Lookarounds
+    (r"/(?=.)vue\.js", None),
+    (r"/vue(?!x)\.js", None),
+    # Alternation
+    (r"/jquery\.js|/zepto\.js", None),
+    (r"/(?:jquery|zepto)/core\.js", "core"),
+    # Common tokens lose to rarer ones, but are used when nothing else is left
+    (r"/js/ghost\.", "ghost"),
+    (r"/static/", "static"),
+    (r"", None),
+])
+def test_index_token(source, token):
+    assert index_token(source) == token
+
+
+def test_index_token_is_contained_in_every_match():
+    import re
+
+    cases = {
+        r"/jquery(?:\.min)?\.js": ["/jquery.js", "/jquery.min.js"],
+        r"/bootstrap(?:-([\d.]+))?(?:\.min)?\.js": ["/bootstrap.js", "/bootstrap-5.3.min.js"],
+        r"[\"']/modernizr[\"']": ["'/modernizr\""],
+    }
+    for source, samples in cases.items():
+        token = index_token(source)
+        for sample in samples:
+            assert re.search(source, sample)
+            assert token in re.findall(r"[a-z0-9]+", sample)
+
+
+def test_inline_scripts_are_matched_against_script_bodies():
+    engine = FingerprintEngine({"technologies": {
+        "Google Analytics": {"scripts": [r"\bga\(\s*'create'"]},
+        "Shopify": {"scriptSrc": [r"cdn\.shopify\.com/"]},
+    }})
+    assert engine.pattern_count == 2
+
+    inline = "window.ga=function(){};\nga( 'create', 'UA-1', 'auto');"
+    detected = engine.analyze(scripts=[inline])
+    assert [tech["name"] for tech in detected] == ["Google Analytics"]
+    # Script URLs are a different input and don't trigger inline patterns
+    assert engine.analyze(script_srcs=["https://x.test/ga('create'"]) == []
+    assert engine.analyze(script_srcs=["https://cdn.shopify.com/s/app.js"])[0]["name"] == "Shopify"
+
+
+def test_analyze_page_splits_script_urls_from_inline_bodies():
+    from types import SimpleNamespace
+
+    from bs4 import BeautifulSoup
+
+    engine = FingerprintEngine({"technologies": {
+        "Inline": {"scripts": [r"\binitwidget\("]},
+        "External": {"scriptSrc": [r"/widget\.js"]},
+    }})
+    html = '<script src="/widget.js"></script><script>initWidget({});</script>'
+    response = SimpleNamespace(
+        url="https://example.test/",
+        headers={},
+        cookies=SimpleNamespace(get_dict=dict),
+        text=html,
+    )
+    detected = engine.analyze_page(response, BeautifulSoup(html, "html.parser"))
+    assert [tech["name"] for tech in detected] == ["External", "Inline"]
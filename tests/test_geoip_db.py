@@ -0,0 +1,20 @@
+from geoip_db import GeoIPDatabase
+
+
+def test_malformed_rows_are_skipped(tmp_path):
+    csv_path = tmp_path / "ranges.csv"
+    csv_path.write_text(
+        "start_ip,end_ip,countryCode,country,regionName,city,lat,lon\n"
+        "1.0.0.0,1.0.0.255,AU,Australia,Queensland,Brisbane,-27.47,153.02\n"
+        "2.0.0.0,2.0.0.255,FR,France,,Paris,not-a-number,2.35\n"
+        "not-an-ip,3.0.0.255,US,United States,,,,\n"
+        "4.0.0.0\n"
+        "67108864,67109119,DE,Germany,,Berlin,52.52,13.40\n"
+    )
+    database = GeoIPDatabase(str(csv_path))
+
+    results = database.lookup_many(["1.0.0.7", "2.0.0.7", "4.0.0.7"])
+    assert results["1.0.0.7"]["city"] == "Brisbane"
+    assert results["1.0.0.7"]["lat"] == -27.47
+    assert results["2.0.0.7"]["status"] == "fail"
+    assert results["4.0.0.7"]["city"] == "Berlin"
@@ -0,0 +1,178 @@
+import json
+import threading
+import time
+
+import pytest
+
+from geolocation import GeolocationEngine
+
+
+def _answer(ip):
+    return {"status": "success", "query": ip, "country": "Testland", "city": f"City {ip}"}
+
+
+def _batch_route(method, path, body):
+    return 200, {}, [_answer(ip) for ip in json.loads(body)]
+
+
+def _engine(stub_server, prefix=""):
+    return GeolocationEngine(base_url=stub_server.url + prefix, db_path="")
+
+
+def test_single_ip_uses_json_endpoint_and_caches(stub_server):
+    stub_server.routes["/json/192.0.2.1"] = lambda method, path, body: (200, {}, _answer("192.0.2.1"))
+    engine = _engine(stub_server)
+
+    assert engine.lookup("192.0.2.1")["city"] == "City 192.0.2.1"
+    assert engine.lookup("192.0.2.1")["city"] == "City 192.0.2.1"
+    assert stub_server.paths() == ["/json/192.0.2.1"]
+
+
+def test_base_url_path_prefix_is_kept(stub_server):
+    stub_server.routes["/proxy/ip-api/json/192.0.2.1"] = lambda method, path, body: (200, {}, _answer("192.0.2.1"))
+    stub_server.routes["/proxy/ip-api/batch"] = _batch_route
+    engine = _engine(stub_server, "/proxy/ip-api/")
+
+    engine.lookup("192.0.2.1")
+    engine.lookup_many(["192.0.2.2", "192.0.2.3"])
+    assert stub_server.paths() == ["/proxy/ip-api/json/192.0.2.1", "/proxy/ip-api/batch"]
+
+
+def test_batches_are_chunked_at_100(stub_server):
+    stub_server.routes["/batch"] = _batch_route
+    engine = _engine(stub_server)
+    ips = [f"10.0.{i // 256}.{i % 256}" for i in range(250)]
+
+    results = engine.lookup_many(ips + ips[:10])
+
+    batch_sizes = [len(json.loads(body)) for _, method, _, body in stub_server.requests]
+    assert batch_sizes == [100, 100, 50]
+    assert set(results) == set(ips)
+    assert all(results[ip]["query"] == ip for ip in ips)
+
+
+def test_rate_limit_headers_throttle_next_request(stub_server):
+    def exhausted(method, path, body):
+        return 200, {"X-Rl": "0", "X-Ttl": "1"}, _answer(path.rsplit("/", 1)[-1])
+
+    stub_server.routes["*"] = exhausted
+    engine = _engine(stub_server)
+
+    engine.lookup("192.0.2.1")
+    engine.lookup("192.0.2.2")
+
+    first, second = (timestamp for timestamp, _, _, _ in stub_server.requests)
+    assert second - first >= 0.9
+
+
+def test_remaining_quota_lowers_local_tokens(stub_server):
+    stub_server.routes["*"] = lambda method, path, body: (200, {"X-Rl": "3", "X-Ttl": "60"}, _answer(path.rsplit("/", 1)[-1]))
+    engine = _engine(stub_server)
+
+    engine.lookup("192.0.2.1")
+    assert engine.single_bucket.tokens <= 3
+
+
+def test_batch_error_fans_out_to_every_ip(stub_server):
+    stub_server.routes["/batch"] = lambda method, path, body: (500, {}, b"boom")
+    engine = _engine(stub_server)
+
+    results = engine.lookup_many(["192.0.2.1", "192.0.2.2", "192.0.2.3"])
+
+    assert len(results) == 3
+    assert all(result["error"].startswith("API error") for result in results.values())
+    # Errors aren't cached, so the next lookup asks again
+    engine.lookup_many(["192.0.2.1", "192.0.2.2"])
+    assert len(stub_server.paths("POST")) == 2
+
+
+def test_missing_and_malformed_answers_become_errors(stub_server):
+    stub_server.routes["/batch"] = lambda method, path, body: (200, {}, [_answer("192.0.2.1")])
+    engine = _engine(stub_server)
+    results = engine.lookup_many(["192.0.2.1", "192.0.2.2"])
+    assert results["192.0.2.1"]["city"] == "City 192.0.2.1"
+    assert results["192.0.2.2"] == {"error": "No geolocation returned for 192.0.2.2"}
+
+    stub_server.routes["/batch"] = lambda method, path, body: (200, {"Content-Type": "application/json"}, b"not json")
+    results = engine.lookup_many(["192.0.2.3", "192.0.2.4"])
+    assert all(result["error"].startswith("Error decoding JSON") for result in results.values())
+
+
+def test_concurrent_callers_share_one_request_and_its_error(stub_server):
+    release = threading.Event()
+
+    def slow_failure(method, path, body):
+        release.wait(5)
+        return 500, {}, b"boom"
+
+    stub_server.routes["/batch"] = slow_failure
+    engine = _engine(stub_server)
+    ips = ["192.0.2.1", "192.0.2.2"]
+    results = []
+    first = threading.Thread(target=lambda: results.append(engine.lookup_many(ips)))
+    first.start()
+    while not stub_server.requests:
+        time.sleep(0.01)
+    second = threading.Thread(target=lambda: results.append(engine.lookup_many(ips)))
+    second.start()
+    time.sleep(0.1)
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert len(stub_server.requests) == 1
+    assert len(results) == 2
+    assert all("error" in result[ip] for result in results for ip in ips)
+
+
+def test_unexpected_errors_still_wake_waiting_threads(stub_server, monkeypatch):
+    import geolocation
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def broken_post(url, **kwargs):
+        started.set()
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(geolocation.http_client, "post", broken_post)
+    engine = _engine(stub_server)
+    ips = ["192.0.2.1", "192.0.2.2"]
+    owner_errors = []
+    waiter_results = []
+
+    def owner():
+        try:
+            engine.lookup_many(ips)
+        except RuntimeError as e:
+            owner_errors.append(e)
+
+    first = threading.Thread(target=owner)
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: waiter_results.append(engine.lookup_many(ips)))
+    second.start()
+    time.sleep(0.1)
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert not second.is_alive()
+    assert len(owner_errors) == 1
+    assert waiter_results[0] == {ip: {"error": "Geolocation lookup failed"} for ip in ips}
+
+
+def test_chunks_after_a_failed_one_are_released(stub_server, monkeypatch):
+    import geolocation
+
+    def broken_post(url, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(geolocation.http_client, "post", broken_post)
+    engine = GeolocationEngine(base_url=stub_server.url, batch_size=2, db_path="")
+    ips = ["192.0.2.1", "192.0.2.2", "192.0.2.3", "192.0.2.4"]
+
+    with pytest.raises(RuntimeError):
+        engine.lookup_many(ips)
+    assert engine._inflight == {}
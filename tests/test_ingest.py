@@ -0,0 +1,88 @@
+import io
+import random
+import string
+
+import pytest
+
+from extractors import extract
+from ingest import KINDS, _shards, iter_ingest_stream, scan_shard
+
+
+def _contact_text(size, seed=0):
+    # ASCII text dense with phones, e-mails, social links and long digit
+    # runs, so plenty of matches straddle any chunk or shard boundary
+    rng = random.Random(seed)
+
+    def word():
+        return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+
+    makers = [
+        lambda: f"+62 812-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+        lambda: f"(021) {rng.randint(100, 999)} {rng.randint(1000, 9999)}",
+        lambda: f"0044 20 {rng.randint(1000, 9999)} {rng.randint(1000, 9999)}",
+        lambda: f"{word()}.{word()}@{word()}.{rng.choice(['com', 'co.id', 'org'])}",
+        lambda: f"https://www.instagram.com/{word()}/",
+        lambda: f"github.com/{word()}/{word()}",
+        lambda: "".join(rng.choices(string.digits, k=rng.randint(20, 80))),
+        lambda: f"{rng.randint(2000, 2030)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+        word, word, word, word,
+    ]
+    pieces = []
+    length = 0
+    while length < size:
+        piece = rng.choice(makers)()
+        pieces.append(piece)
+        length += len(piece) + 1
+    return rng.choice([" ", "\n", ", "]).join(pieces)
+
+
+def _expected(text):
+    found = extract(text)
+    return {(kind, value) for kind in KINDS for value in found[kind]}
+
+
+def _scan(path, shard_size, **kwargs):
+    found = set()
+    for start, end in _shards(str(path), shard_size):
+        _, findings = scan_shard(str(path), start, end, **kwargs)
+        found.update(findings)
+    return found
+
+
+@pytest.fixture(scope="module")
+def contact_file(tmp_path_factory):
+    text = _contact_text(60_000)
+    path = tmp_path_factory.mktemp("ingest") / "contacts.txt"
+    path.write_text(text)
+    return path, _expected(text)
+
+
+@pytest.mark.parametrize("shard_size", [333, 4096, 10 ** 9])
+@pytest.mark.parametrize("chunk_size", [7, 1000, 1025, 65536])
+def test_chunked_scan_matches_a_single_pass(contact_file, shard_size, chunk_size):
+    path, expected = contact_file
+    assert _scan(path, shard_size, chunk_size=chunk_size) == expected
+
+
+@pytest.mark.parametrize("shard_size", [333, 1024, 4096, 10 ** 9])
+def test_mmap_scan_matches_a_single_pass(contact_file, shard_size):
+    path, expected = contact_file
+    assert _scan(path, shard_size, use_mmap=True) == expected
+
+
+@pytest.mark.parametrize("chunk_size", [7, 1025, 65536])
+def test_stream_scan_matches_a_single_pass(contact_file, chunk_size):
+    path, expected = contact_file
+    found = {(kind, value) for kind, value, _ in iter_ingest_stream(io.BytesIO(path.read_bytes()), chunk_size)}
+    assert found == expected
+
+
+def test_free_text_is_never_read_from_disk(tmp_path, monkeypatch):
+    import extra_functions
+
+    (tmp_path / "notes").write_text("+62 812-5555-0101")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(extra_functions, "ingest", lambda *args, **kwargs: pytest.fail("ingest called"))
+
+    assert extra_functions.phone_number_lookup("notes") == {"message": "No phone numbers detected"}
+    assert extra_functions.email_lookup(".") == {"message": "No emails detected"}
@@ -0,0 +1,209 @@
+import asyncio
+import datetime
+import socket
+import ssl
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+import service_probe
+from service_probe import probe, probe_service
+
+BANNER_WAIT = 0.3
+
+
+@pytest.fixture(scope="module")
+def server_tls_context(tmp_path_factory):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "probe.test")])
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+        .not_valid_after(datetime.datetime(2034, 1, 1, tzinfo=datetime.timezone.utc))
+        .sign(key, hashes.SHA256())
+    )
+    directory = tmp_path_factory.mktemp("probe")
+    cert_path = directory / "cert.pem"
+    key_path = directory / "key.pem"
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+def _greeter(greeting):
+    # A service that speaks first and then waits for the client to leave
+    async def handle(reader, writer):
+        writer.write(greeting)
+        await reader.read()
+    return handle
+
+
+async def _http_server(reader, writer):
+    # Silent until it has read a whole request, then answers like nginx
+    request = await reader.readuntil(b"\r\n\r\n")
+    writer.write(b"HTTP/1.1 200 OK\r\nServer: nginx/1.25.3\r\nContent-Length: 0\r\n\r\n" if request.startswith(b"HEAD / ") else b"HTTP/1.1 405 Method Not Allowed\r\n\r\n")
+    await reader.read()
+
+
+def _serve(handler, ssl_context=None, scenario=None, **probe_kwargs):
+    # Runs `handler` behind a listener on 127.0.0.1 and probes it. Returns
+    # the probe result and how many connections reached the handler.
+    connections = []
+
+    async def handle(reader, writer):
+        connections.append(asyncio.current_task())
+        try:
+            await handler(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, ssl.SSLError):
+            pass
+        finally:
+            writer.transport.abort()
+
+    async def run():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0, ssl=ssl_context)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            if scenario is not None:
+                scenario(port)
+            result = await probe_service("127.0.0.1", port, banner_wait=BANNER_WAIT, **probe_kwargs)
+            # The probe has hung up; let the handlers see that before the
+            # loop shuts down
+            if connections:
+                await asyncio.wait(connections, timeout=5)
+            return result
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(run()), len(connections)
+
+
+@pytest.mark.parametrize("greeting, service, product", [
+    (b"SSH-2.0-OpenSSH_9.6p1 Ubuntu-3ubuntu13\r\n", "ssh", "OpenSSH_9.6p1 Ubuntu-3ubuntu13"),
+    (b"220 (vsFTPd 3.0.5) FTP server ready\r\n", "ftp", "(vsFTPd 3.0.5) FTP server ready"),
+    (b"220-ProFTPD FTP Server\r\n220 ready\r\n", "ftp", "ProFTPD FTP Server"),
+    (b"+OK Dovecot ready.\r\n", "pop3", "Dovecot ready."),
+    (b"* OK [CAPABILITY IMAP4rev1 STARTTLS] Dovecot ready.\r\n", "imap", "[CAPABILITY IMAP4rev1 STARTTLS] Dovecot ready."),
+])
+def test_banner_signatures(greeting, service, product):
+    result, connections = _serve(_greeter(greeting))
+    assert result == {"service": service, "banner": greeting.split(b"\r\n")[0].decode(), "product": product}
+    assert connections == 1
+
+
+def test_mysql_greeting_packet():
+    payload = b"\x0a8.0.36-0ubuntu0.22.04.1\x00" + b"\x08\x00\x00\x00" + b"abcdefgh\x00" + b"\xff\xf7\x21\x02\x00"
+    packet = len(payload).to_bytes(3, "little") + b"\x00" + payload
+    result, _ = _serve(_greeter(packet))
+    assert result == {"service": "mysql", "banner": "8.0.36-0ubuntu0.22.04.1", "product": "8.0.36-0ubuntu0.22.04.1"}
+
+
+def test_smtp_is_confirmed_with_ehlo():
+    received = []
+
+    async def smtp(reader, writer):
+        writer.write(b"220 mail.probe.test ESMTP Postfix\r\n")
+        received.append(await reader.readline())
+        writer.write(b"250-mail.probe.test\r\n250-PIPELINING\r\n250-SIZE 10240000\r\n250 STARTTLS\r\n")
+        received.append(await reader.readline())
+
+    result, _ = _serve(smtp)
+    assert received == [b"EHLO probe.invalid\r\n", b"QUIT\r\n"]
+    assert result == {
+        "service": "smtp",
+        "banner": "220 mail.probe.test ESMTP Postfix",
+        "product": "mail.probe.test ESMTP Postfix",
+        "extensions": ["PIPELINING", "SIZE 10240000", "STARTTLS"],
+        "starttls": True,
+    }
+
+
+def test_smtp_without_starttls():
+    async def smtp(reader, writer):
+        writer.write(b"220 relay.probe.test ESMTP\r\n")
+        await reader.readline()
+        writer.write(b"250-relay.probe.test\r\n250 8BITMIME\r\n")
+        await reader.read()
+
+    result, _ = _serve(smtp)
+    assert result["service"] == "smtp"
+    assert result["starttls"] is False
+
+
+def test_silent_port_is_probed_with_http_head():
+    result, connections = _serve(_http_server)
+    assert result == {"service": "http", "banner": "HTTP/1.1 200 OK", "product": "nginx/1.25.3"}
+    # Identified in plaintext, so TLS is never tried
+    assert connections == 1
+
+
+def test_silent_tls_port_falls_back_from_http_to_tls(server_tls_context):
+    result, connections = _serve(_http_server, server_tls_context)
+    assert result["service"] == "https"
+    assert result["product"] == "nginx/1.25.3"
+    assert result["tls_version"].startswith("TLSv1")
+    assert result["certificate_subject"] == {"CN": "probe.test"}
+    # The plaintext attempt never completes a handshake
+    assert connections == 1
+
+
+def test_tls_without_a_recognised_protocol(server_tls_context):
+    async def silent(reader, writer):
+        await reader.read()
+
+    result, _ = _serve(silent, server_tls_context)
+    assert result["service"] == "tls"
+    assert result["certificate_subject"] == {"CN": "probe.test"}
+
+
+def test_tls_first_port_skips_plaintext(server_tls_context, monkeypatch):
+    imaps = _greeter(b"* OK IMAPS ready\r\n")
+    result, connections = _serve(imaps, server_tls_context, scenario=lambda port: monkeypatch.setattr(service_probe, "TLS_FIRST_PORTS", frozenset((port,))))
+    assert result["service"] == "imap"
+    assert result["product"] == "IMAPS ready"
+    assert result["certificate_subject"] == {"CN": "probe.test"}
+    assert connections == 1
+
+
+def test_tls_first_port_falls_back_to_plaintext(monkeypatch):
+    result, connections = _serve(_greeter(b"SSH-2.0-dropbear\r\n"), scenario=lambda port: monkeypatch.setattr(service_probe, "TLS_FIRST_PORTS", frozenset((port,))))
+    assert result["service"] == "ssh"
+    # One connection for the failed handshake, one in plaintext
+    assert connections == 2
+
+
+def test_unparsable_certificate_leaves_out_the_subject(server_tls_context, monkeypatch):
+    def reject(der):
+        raise ValueError("error parsing asn1 value")
+
+    monkeypatch.setattr(service_probe, "parse_certificate", reject)
+    result, _ = _serve(_greeter(b"+OK POP3S ready\r\n"), server_tls_context)
+    assert result["service"] == "pop3"
+    assert "tls_version" in result
+    assert "certificate_subject" not in result
+
+
+def test_refused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    result = asyncio.run(probe_service("127.0.0.1", port, banner_wait=BANNER_WAIT))
+    assert result["error"].startswith(f"Could not connect to 127.0.0.1:{port}: ")
+
+
+def test_probe_reports_each_endpoint():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        closed = sock.getsockname()[1]
+    results = probe([("127.0.0.1", closed), ("127.0.0.1", closed, "probe.test")], banner_wait=BANNER_WAIT)
+    assert list(results) == [("127.0.0.1", closed)]
+    assert "error" in results[("127.0.0.1", closed)]
@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+import subdomain_enum
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_does_not_create_the_index(tmp_path):
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT}
+    subprocess.run([sys.executable, "-c", "import subdomain_enum, pipeline"], cwd=tmp_path, env=env, check=True)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_index_is_opened_once_on_first_use(tmp_path, monkeypatch):
+    opened = []
+
+    def open_index():
+        opened.append(tmp_path)
+        return "index"
+
+    monkeypatch.setattr(subdomain_enum, "open_subdomain_index", open_index)
+    monkeypatch.setattr(subdomain_enum, "_index", None)
+    monkeypatch.setattr(subdomain_enum, "_index_opened", False)
+
+    assert subdomain_enum.get_index() == "index"
+    assert subdomain_enum.get_index() == "index"
+    assert len(opened) == 1
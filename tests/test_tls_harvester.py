@@ -0,0 +1,181 @@
+import asyncio
+import datetime
+import gc
+import ipaddress
+import os
+import socket
+import ssl
+import threading
+import warnings
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from tls_harvester import _peer_chain, harvest, harvest_hosts, iter_harvest, parse_certificate
+
+NOT_BEFORE = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+NOT_AFTER = datetime.datetime(2034, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _self_signed(tmp_path):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "tls.test"), x509.NameAttribute(NameOID.ORGANIZATION_NAME, "Harvest Tests")])
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(4242)
+        .not_valid_before(NOT_BEFORE)
+        .not_valid_after(NOT_AFTER)
+        .add_extension(x509.SubjectAlternativeName([
+            x509.DNSName("tls.test"),
+            x509.DNSName("www.tls.test"),
+            x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+        ]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = tmp_path / "cert.pem"
+    key_path = tmp_path / "key.pem"
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    return cert, cert_path, key_path
+
+
+class LoopServer:
+    # asyncio servers on a loop of their own, so the code under test can
+    # call asyncio.run in the test thread
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.servers = []
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def listen(self, ssl_context=None, greeting=b""):
+        async def handle(reader, writer):
+            try:
+                writer.write(greeting)
+                await reader.read()
+            except (ConnectionError, ssl.SSLError):
+                pass
+            writer.transport.abort()
+
+        async def start():
+            return await asyncio.start_server(handle, "127.0.0.1", 0, ssl=ssl_context)
+
+        server = asyncio.run_coroutine_threadsafe(start(), self.loop).result(5)
+        self.servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    def close(self):
+        for server in self.servers:
+            self.loop.call_soon_threadsafe(server.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(5)
+        self.loop.close()
+
+
+@pytest.fixture
+def tls_site(tmp_path):
+    cert, cert_path, key_path = _self_signed(tmp_path)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    servers = LoopServer()
+    tls_port = servers.listen(context)
+    plain_port = servers.listen(greeting=b"220 plain.test ESMTP\r\n")
+    silent_port = servers.listen()
+    yield cert, tls_port, plain_port, silent_port
+    servers.close()
+
+
+def _closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+def test_certificate_fields(tls_site):
+    cert, tls_port, _, _ = tls_site
+
+    info = harvest([("127.0.0.1", tls_port, "tls.test")])[("127.0.0.1", tls_port)]
+
+    assert info["Subject"] == {"CN": "tls.test", "O": "Harvest Tests"}
+    assert info["Issuer"] == info["Subject"]
+    assert info["Serial Number"] == 4242
+    assert info["Subject Alternative Names"] == ["tls.test", "www.tls.test", "127.0.0.1"]
+    assert info["Not Before"] == NOT_BEFORE.isoformat()
+    assert info["Not After"] == NOT_AFTER.isoformat()
+    assert info["SHA256 Fingerprint"] == cert.fingerprint(hashes.SHA256()).hex(":").upper()
+    assert info["SHA1 Fingerprint"] == cert.fingerprint(hashes.SHA1()).hex(":").upper()
+    assert info["TLS Version"].startswith("TLS")
+    assert info["Chain"] == []
+    assert parse_certificate(cert.public_bytes(serialization.Encoding.DER))["Serial Number"] == 4242
+
+
+def test_error_results(tls_site):
+    _, tls_port, plain_port, silent_port = tls_site
+    closed_port = _closed_port()
+
+    results = harvest([("127.0.0.1", plain_port), ("127.0.0.1", closed_port)], timeout=2)
+    silent = harvest([("127.0.0.1", silent_port)], timeout=0.5)
+    verified = harvest([("127.0.0.1", tls_port, "tls.test")], verify=True)
+
+    assert results[("127.0.0.1", plain_port)]["error"].startswith("Error retrieving SSL certificate")
+    assert silent[("127.0.0.1", silent_port)] == {"error": "Connection timed out while retrieving SSL certificate"}
+    assert results[("127.0.0.1", closed_port)]["error"].startswith("Error retrieving SSL certificate")
+    assert verified[("127.0.0.1", tls_port)]["error"].startswith("Certificate verification failed")
+
+
+def test_harvest_hosts_merges_scanned_ports(tls_site):
+    _, tls_port, plain_port, _ = tls_site
+
+    certificates = harvest_hosts(["127.0.0.1"], {"127.0.0.1": [tls_port, plain_port]}, "tls.test", ports=())
+
+    # The plaintext port fails the handshake and is left out
+    assert list(certificates["127.0.0.1"]) == [tls_port]
+
+
+def test_no_sockets_left_open(tls_site):
+    # Measured while the event loop is still running, since closing the
+    # loop tidies up leaked transports on its own. A transport that is only
+    # closed when garbage collected warns about it.
+    _, tls_port, plain_port, _ = tls_site
+    endpoints = [("127.0.0.1", tls_port, "tls.test")] * 40 + [("127.0.0.1", plain_port)] * 10
+
+    async def run():
+        gc.collect()
+        before = _open_fds()
+        results = [result async for result in iter_harvest(endpoints, concurrency=8, timeout=2)]
+        await asyncio.sleep(0)
+        gc.collect()
+        return results, before, _open_fds()
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ResourceWarning)
+        results, before, after = asyncio.run(run())
+    assert len(results) == 50
+    assert after <= before
+    assert not [str(warning.message) for warning in caught if issubclass(warning.category, ResourceWarning)]
+
+
+def test_chain_uses_only_the_public_api():
+    class Legacy:
+        _sslobj = object()
+
+        def getpeercert(self, binary_form=False):
+            return b"leaf"
+
+    class Modern(Legacy):
+        def get_unverified_chain(self):
+            return [b"leaf", b"intermediate"]
+
+    assert _peer_chain(Legacy()) == [b"leaf"]
+    assert _peer_chain(Modern()) == [b"leaf", b"intermediate"]
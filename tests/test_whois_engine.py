@@ -0,0 +1,70 @@
+import threading
+import time
+import types
+
+import pytest
+
+import whois_engine
+from whois_engine import WhoisEngine
+
+
+@pytest.fixture
+def fake_whois(monkeypatch):
+    # Records (domain, start time) and answers instantly, except that
+    # domains under .limited get a registry rate-limit reply
+    calls = []
+    lock = threading.Lock()
+
+    def query(domain, timeout=None):
+        with lock:
+            calls.append((domain, time.monotonic()))
+        if domain.endswith(".limited"):
+            return types.SimpleNamespace(domain_name=None, text="Query rate limit exceeded")
+        return types.SimpleNamespace(domain_name=domain.upper(), text="")
+
+    monkeypatch.setattr(whois_engine.whois, "whois", query)
+    return calls
+
+
+def _engine(**kwargs):
+    settings = {"workers": 2, "per_registry": 1, "min_interval": 0.4, "backoff": 1.0, "timeout": 1}
+    settings.update(kwargs)
+    engine = WhoisEngine(**settings)
+    engine.cache = whois_engine.TTLCache(db_path="")
+    return engine
+
+
+def test_throttled_registry_does_not_hold_the_workers(fake_whois):
+    engine = _engine()
+    started = time.monotonic()
+    slow = [engine.submit(f"site{i}.slow") for i in range(4)]
+    others = {domain: engine.submit(domain) for domain in ("example.com", "example.org", "example.net")}
+
+    for domain, future in others.items():
+        assert future.result(2).domain_name == domain.upper()
+    assert time.monotonic() - started < 0.3
+
+    for future in slow:
+        future.result(5)
+    slow_starts = [start for domain, start in fake_whois if domain.endswith(".slow")]
+    assert all(later - earlier >= 0.35 for earlier, later in zip(slow_starts, slow_starts[1:]))
+
+
+def test_lookups_are_cached_and_coalesced(fake_whois):
+    engine = _engine()
+
+    results = engine.lookup_many(["Example.com", "example.com.", "example.com"])
+    assert list(results) == ["example.com"]
+    engine.lookup("example.com")
+    assert [domain for domain, _ in fake_whois] == ["example.com"]
+
+
+def test_rate_limit_reply_backs_the_registry_off(fake_whois):
+    engine = _engine()
+
+    first = engine.lookup("a.limited")
+    assert "rate limiting" in first["error"]
+    engine.lookup("b.limited")
+
+    starts = [start for _, start in fake_whois]
+    assert starts[1] - starts[0] >= 0.9
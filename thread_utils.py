@@ -1,38 +1,124 @@
 import socket
+import errno
+import time
+import os
+import asyncio
+import itertools
 import concurrent.futures
 import streamlit as st
 
+from config import SCAN_TIMING, SCAN_WORKERS, SCAN_SHARD_SIZE
+from scan_timing import RttTimer
 
-def thread_scan_port(ip, port):
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(0.1)
-        result = sock.connect_ex((ip, port))
-        sock.close()
-        if result == 0:
-            return port
-        return None
-    except socket.gaierror as e:
-         return {"error": f"Socket error: {e}"}
-    except OSError as e:
-      if e.errno == 111: 
-        return None
-      return {"error": f"An OS error occurred: {e}"}
-    except Exception as e:
-       return {"error": f"An error occurred: {e}"}
-
-
-def thread_port_scan(ip, start_port, end_port):
-    if not isinstance(start_port, int) or not isinstance(end_port, int) or start_port < 1 or end_port > 65535 or start_port > end_port:
+
+def thread_scan_port(ip, port, timer=None):
+    if timer is None:
+        timer = RttTimer(SCAN_TIMING)
+    for _ in range(timer.max_retries + 1):
+        try:
+            with socket.socket(socket.AF_INET6 if ":" in ip else socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timer.timeout)
+                started = time.perf_counter()
+                result = sock.connect_ex((ip, port))
+                elapsed = time.perf_counter() - started
+            if result == 0:
+                timer.record(elapsed)
+                return port
+            if result == errno.ECONNREFUSED:
+                timer.record(elapsed)
+                return None
+            # Anything but a timeout is a definite (if unhelpful) answer
+            if result not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.ETIMEDOUT):
+                return None
+        except socket.timeout:
+            continue
+        except socket.gaierror as e:
+             return {"error": f"Socket error: {e}"}
+        except OSError as e:
+          if e.errno == 111:
+            return None
+          return {"error": f"An OS error occurred: {e}"}
+        except Exception as e:
+           return {"error": f"An error occurred: {e}"}
+    return None
+
+
+def _thread_scan_range(ip, start_port, end_port, timing=SCAN_TIMING, max_workers=250):
+    # Submits ports in a bounded window rather than materialising every
+    # port (and a matching list of IPs) up front.
+    timer = RttTimer(timing)
+    ports = iter(range(start_port, end_port + 1))
+    open_ports = []
+    errors = set()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(thread_scan_port, ip, port, timer) for port in itertools.islice(ports, max_workers * 2)}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for port in itertools.islice(ports, len(done)):
+                pending.add(executor.submit(thread_scan_port, ip, port, timer))
+            for future in done:
+                result = future.result()
+                if isinstance(result, int):
+                    open_ports.append(result)
+                elif isinstance(result, dict) and "error" in result:
+                    errors.add(result["error"])
+    return sorted(open_ports), errors
+
+
+def _valid_port_range(start_port, end_port):
+    return isinstance(start_port, int) and isinstance(end_port, int) and 1 <= start_port <= end_port <= 65535
+
+
+def thread_port_scan(ip, start_port, end_port, timing=SCAN_TIMING):
+    if not _valid_port_range(start_port, end_port):
         st.error("Invalid port range.")
         return []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=250) as executor:
-        ports = list(range(start_port, end_port + 1))
-        results = executor.map(thread_scan_port, [ip] * len(ports), ports)
+    open_ports, errors = _thread_scan_range(ip, start_port, end_port, timing)
+    for error in errors:
+        st.error(error)
+    return open_ports
+
+
+def _scan_shard(ip, start_port, end_port, mode, timing):
+    # Runs inside a worker process, so it reports errors back to the
+    # parent instead of calling into Streamlit.
+    if mode == "thread":
+        return _thread_scan_range(ip, start_port, end_port, timing)
+
+    from async_utils import iter_open_ports
+
+    async def collect():
         open_ports = []
-        for result in results:
-          if isinstance(result,int):
-            open_ports.append(result)
-          elif isinstance(result, dict) and "error" in result:
-             st.error(result["error"])
-        return open_ports
+        errors = set()
+        async for port in iter_open_ports(ip, start_port, end_port, error_callback=errors.add, timing=timing):
+            open_ports.append(port)
+        return sorted(open_ports), errors
+
+    return asyncio.run(collect())
+
+
+def sharded_port_scan(ip, start_port, end_port, workers=SCAN_WORKERS, shard_size=SCAN_SHARD_SIZE, mode="async", timing=SCAN_TIMING):
+    # Splits the range into shards and scans them in a ProcessPoolExecutor,
+    # one async (or threaded) scanner per worker, so throughput scales with
+    # cores instead of being capped by a single interpreter's GIL.
+    if not _valid_port_range(start_port, end_port):
+        st.error("Invalid port range.")
+        return []
+    if mode not in ("async", "thread"):
+        st.error(f"Invalid scan mode: {mode}")
+        return []
+
+    workers = workers or os.cpu_count() or 1
+    shards = [(shard_start, min(shard_start + shard_size - 1, end_port)) for shard_start in range(start_port, end_port + 1, shard_size)]
+    open_ports = set()
+    errors = set()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+        futures = [executor.submit(_scan_shard, ip, shard_start, shard_end, mode, timing) for shard_start, shard_end in shards]
+        for future in concurrent.futures.as_completed(futures):
+            shard_ports, shard_errors = future.result()
+            open_ports.update(shard_ports)
+            errors.update(shard_errors)
+
+    for error in errors:
+        st.error(error)
+    return sorted(open_ports)
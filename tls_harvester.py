@@ -0,0 +1,154 @@
+import asyncio
+import contextlib
+import ssl
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+
+from config import TLS_PORTS, TLS_TIMEOUT, TLS_CONCURRENCY
+from async_utils import iter_windowed
+
+# One context per verification mode is shared by every handshake. The
+# unverified one is what lets the harvester read self-signed, expired or
+# mismatched certificates, which are often the interesting ones.
+_verified_context = ssl.create_default_context()
+_unverified_context = ssl.create_default_context()
+_unverified_context.check_hostname = False
+_unverified_context.verify_mode = ssl.CERT_NONE
+
+
+def ssl_context(verify=False):
+    return _verified_context if verify else _unverified_context
+
+
+def _name_to_dict(name):
+    return {attribute.rfc4514_attribute_name: attribute.value for attribute in name}
+
+
+def _fingerprints(cert):
+    return cert.fingerprint(hashes.SHA256()).hex(":").upper(), cert.fingerprint(hashes.SHA1()).hex(":").upper()
+
+
+def _validity(cert):
+    # The *_utc properties appeared in cryptography 42
+    not_before = getattr(cert, "not_valid_before_utc", None) or cert.not_valid_before
+    not_after = getattr(cert, "not_valid_after_utc", None) or cert.not_valid_after
+    return not_before, not_after
+
+
+def _subject_alt_names(cert):
+    try:
+        extension = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName)
+    except x509.ExtensionNotFound:
+        return []
+    names = extension.value.get_values_for_type(x509.DNSName)
+    names += [str(ip) for ip in extension.value.get_values_for_type(x509.IPAddress)]
+    return names
+
+
+def parse_certificate(der):
+    # Reads a DER certificate straight from the handshake, without a PEM
+    # round trip. Keys match what ssl_certificate_info has always returned,
+    # plus SANs, validity and fingerprints.
+    cert = x509.load_der_x509_certificate(der)
+    sha256, sha1 = _fingerprints(cert)
+    not_before, not_after = _validity(cert)
+    return {
+        "Issuer": _name_to_dict(cert.issuer),
+        "Subject": _name_to_dict(cert.subject),
+        "Version": cert.version.value,
+        "Serial Number": cert.serial_number,
+        "Subject Alternative Names": _subject_alt_names(cert),
+        "Not Before": not_before.isoformat(),
+        "Not After": not_after.isoformat(),
+        "SHA256 Fingerprint": sha256,
+        "SHA1 Fingerprint": sha1,
+    }
+
+
+def _summarize_chain_certificate(der):
+    cert = x509.load_der_x509_certificate(der)
+    sha256, _ = _fingerprints(cert)
+    _, not_after = _validity(cert)
+    return {
+        "Subject": _name_to_dict(cert.subject),
+        "Issuer": _name_to_dict(cert.issuer),
+        "Not After": not_after.isoformat(),
+        "SHA256 Fingerprint": sha256,
+    }
+
+
+def _peer_chain(ssl_object):
+    # The chain the server sent, leaf first. SSLObject only exposes it
+    # from Python 3.13; before that just the leaf is known.
+    getter = getattr(ssl_object, "get_unverified_chain", None)
+    if getter is None:
+        return [ssl_object.getpeercert(True)]
+    return [bytes(cert) for cert in getter() or []]
+
+
+async def fetch_certificate(host, port=443, server_hostname=None, timeout=TLS_TIMEOUT, verify=False):
+    # Handshakes with host:port and returns the parsed certificate and
+    # chain, or {"error": ...}. The connection is aborted as soon as the
+    # certificate is read, so its socket is closed before this returns.
+    server_hostname = server_hostname or host
+    writer = None
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context(verify), server_hostname=server_hostname),
+            timeout,
+        )
+        ssl_object = writer.get_extra_info("ssl_object")
+        der = ssl_object.getpeercert(True)
+        if not der:
+            return {"error": f"No certificate presented by {host}:{port}"}
+        info = parse_certificate(der)
+        info["TLS Version"] = ssl_object.version()
+        info["Cipher"] = ssl_object.cipher()[0]
+        info["Chain"] = [_summarize_chain_certificate(cert) for cert in _peer_chain(ssl_object)[1:]]
+        return info
+    except asyncio.TimeoutError:
+        return {"error": "Connection timed out while retrieving SSL certificate"}
+    except ssl.SSLCertVerificationError as e:
+        return {"error": f"Certificate verification failed: {e.verify_message}"}
+    except (OSError, ssl.SSLError, ValueError) as e:
+        return {"error": f"Error retrieving SSL certificate: {e}"}
+    finally:
+        if writer is not None:
+            writer.transport.abort()
+
+
+async def iter_harvest(endpoints, concurrency=TLS_CONCURRENCY, timeout=TLS_TIMEOUT, verify=False):
+    # Fetches certificates for (host, port) or (host, port, server_hostname)
+    # endpoints with at most `concurrency` handshakes in flight, yielding
+    # ((host, port), result) as each finishes.
+    async def fetch(endpoint):
+        host, port, *server_hostname = endpoint
+        return (host, port), await fetch_certificate(host, port, server_hostname[0] if server_hostname else None, timeout, verify)
+
+    async with contextlib.aclosing(iter_windowed(endpoints, fetch, concurrency)) as results:
+        async for result in results:
+            yield result
+
+
+def harvest(endpoints, concurrency=TLS_CONCURRENCY, timeout=TLS_TIMEOUT, verify=False):
+    async def collect():
+        return {endpoint: result async for endpoint, result in iter_harvest(endpoints, concurrency, timeout, verify)}
+    return asyncio.run(collect())
+
+
+def harvest_hosts(ips, open_ports=None, server_hostname=None, ports=TLS_PORTS):
+    # Certificates for every IP on the standard TLS ports plus any port the
+    # scan found open there. Ports that don't speak TLS simply fail the
+    # handshake and are left out. Returns {ip: {port: certificate}}.
+    open_ports = open_ports or {}
+    endpoints = [
+        (ip, port, server_hostname)
+        for ip in ips
+        for port in sorted(set(ports) | set(open_ports.get(ip, [])))
+    ]
+    certificates = {ip: {} for ip in ips}
+    for (ip, port), result in harvest(endpoints).items():
+        if "error" not in result:
+            certificates[ip][port] = result
+    return certificates
@@ -1,17 +1,19 @@
-import requests
 import streamlit as st
-import json
 
+from cache_utils import cached
+from geolocation import geolocation_engine
+
+@cached("geoip")
 def get_geolocation(ip):
     if not ip:
         return {"error": "IP Address cannot be empty."}
     with st.spinner(f"Getting geolocation for {ip}"):
-        url = f"http://ip-api.com/json/{ip}"
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {"error": f"API error: {e}"}
-        except json.JSONDecodeError as e:
-            return {"error": f"Error decoding JSON: {e}"}
+        return geolocation_engine.lookup(ip)
+
+
+def get_geolocation_bulk(ips):
+    ips = [ip for ip in ips if ip]
+    if not ips:
+        return {}
+    with st.spinner(f"Getting geolocation for {len(ips)} IP addresses"):
+        return geolocation_engine.lookup_many(ips)
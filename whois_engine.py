@@ -0,0 +1,184 @@
+import collections
+import concurrent.futures
+import itertools
+import re
+import threading
+import time
+
+import whois
+
+from cache_utils import TTLCache, normalize_target
+from config import WHOIS_WORKERS, WHOIS_PER_REGISTRY, WHOIS_MIN_INTERVAL, WHOIS_BACKOFF, WHOIS_TIMEOUT, CACHE_TTLS
+
+# python-whois renamed its "not found" exception in 0.9
+NOT_FOUND_ERRORS = tuple(
+    getattr(whois.parser, name) for name in ("PywhoisError", "WhoisDomainNotFoundError") if hasattr(whois.parser, name)
+)
+
+# Phrases registries use when they start refusing queries
+RATE_LIMIT_REGEX = re.compile(r"limit exceeded|quota exceeded|too many (?:queries|requests)|rate limit|try again later", re.IGNORECASE)
+
+
+class RegistryGate:
+    # Throttle for one registry: at most `concurrency` queries in flight and
+    # at least `min_interval` seconds between the start of two queries.
+    # Nothing here blocks; the engine queues what can't start yet, so a
+    # throttled registry never ties up a worker thread. Guarded by the
+    # engine's lock.
+
+    def __init__(self, concurrency, min_interval):
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.in_flight = 0
+        self.next_start = 0.0
+        self.queue = collections.deque()
+        self.timer = None
+
+    def reserve(self):
+        # Takes a slot and returns 0 if a query may start now. Otherwise
+        # returns the seconds until the interval allows one, or None while
+        # every slot is busy (a finishing query frees one).
+        if self.in_flight >= self.concurrency:
+            return None
+        now = time.monotonic()
+        if now < self.next_start:
+            return self.next_start - now
+        self.in_flight += 1
+        self.next_start = now + self.min_interval
+        return 0
+
+    def release(self):
+        self.in_flight -= 1
+
+    def back_off(self, seconds):
+        self.next_start = max(self.next_start, time.monotonic() + seconds)
+
+
+def registry_of(domain):
+    # WHOIS servers are assigned per TLD, so the TLD identifies the registry
+    return domain.rsplit(".", 1)[-1]
+
+
+def _interleave_by_registry(domains):
+    # Round-robin across registries so a long list for one TLD doesn't
+    # occupy every worker while other registries sit idle.
+    groups = {}
+    for domain in domains:
+        groups.setdefault(registry_of(domain), []).append(domain)
+    return [domain for batch in itertools.zip_longest(*groups.values()) for domain in batch if domain is not None]
+
+
+class WhoisEngine:
+    # Runs python-whois queries on a thread pool, throttled per registry.
+    # Parsed records are cached for CACHE_TTLS["whois"] seconds (persisted
+    # when CACHE_DB_PATH is set), and a domain already being looked up is
+    # awaited instead of queried again.
+
+    def __init__(self, workers=WHOIS_WORKERS, per_registry=WHOIS_PER_REGISTRY, min_interval=WHOIS_MIN_INTERVAL, backoff=WHOIS_BACKOFF, timeout=WHOIS_TIMEOUT):
+        self.per_registry = per_registry
+        self.min_interval = min_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = TTLCache()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="whois")
+        self._gates = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _gate(self, registry):
+        # Called with self._lock held
+        if registry not in self._gates:
+            self._gates[registry] = RegistryGate(self.per_registry, self.min_interval)
+        return self._gates[registry]
+
+    def _query(self, domain, gate):
+        try:
+            w = whois.whois(domain, timeout=self.timeout)
+        except NOT_FOUND_ERRORS:
+            return {"error": f"Error retrieving WHOIS data: Domain {domain} not found"}
+        except Exception as e:
+            return {"error": f"Error retrieving WHOIS data: {e}"}
+        if w.domain_name is None:
+            if RATE_LIMIT_REGEX.search(w.text or ""):
+                with self._lock:
+                    gate.back_off(self.backoff)
+                return {"error": f"Error retrieving WHOIS data: the .{registry_of(domain)} registry is rate limiting queries"}
+            return {"error": f"Error retrieving WHOIS data: Domain {domain} not found"}
+        return w
+
+    def _dispatch(self, registry):
+        # Starts as many of the registry's queued queries as its gate
+        # allows. When the interval is what holds them back, a timer comes
+        # back for the rest; when the slots are, the next query to finish does.
+        gate = self._gates[registry]
+        while gate.queue:
+            wait = gate.reserve()
+            if wait is None:
+                return
+            if wait > 0:
+                if gate.timer is None:
+                    gate.timer = threading.Timer(wait, self._dispatch_later, (registry,))
+                    gate.timer.daemon = True
+                    gate.timer.start()
+                return
+            domain, future = gate.queue.popleft()
+            self._executor.submit(self._run, registry, domain, future)
+
+    def _dispatch_later(self, registry):
+        with self._lock:
+            self._gates[registry].timer = None
+            self._dispatch(registry)
+
+    def _run(self, registry, domain, future):
+        gate = self._gates[registry]
+        try:
+            if future.set_running_or_notify_cancel():
+                future.set_result(self._query(domain, gate))
+        finally:
+            with self._lock:
+                gate.release()
+                self._dispatch(registry)
+
+    def submit(self, domain):
+        # Returns a Future for the record of `domain`
+        domain = normalize_target(domain)
+        key = f"whois:{domain}"
+        with self._lock:
+            hit, value = self.cache.get(key)
+            if hit:
+                future = concurrent.futures.Future()
+                future.set_result(value)
+                return future
+            if domain in self._inflight:
+                return self._inflight[domain]
+            future = self._inflight[domain] = concurrent.futures.Future()
+            registry = registry_of(domain)
+            self._gate(registry).queue.append((domain, future))
+            self._dispatch(registry)
+        future.add_done_callback(lambda done: self._finish(domain, key, done))
+        return future
+
+    def _finish(self, domain, key, future):
+        with self._lock:
+            self._inflight.pop(domain, None)
+            if not future.cancelled() and future.exception() is None:
+                result = future.result()
+                if not (isinstance(result, dict) and "error" in result):
+                    self.cache.set(key, result, CACHE_TTLS["whois"])
+
+    def lookup(self, domain):
+        return self.submit(domain).result()
+
+    def iter_lookup_many(self, domains):
+        # Yields (domain, record) for every distinct domain as each lookup
+        # finishes
+        domains = _interleave_by_registry(dict.fromkeys(normalize_target(domain) for domain in domains if domain))
+        futures = {self.submit(domain): domain for domain in domains}
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future.result()
+
+    def lookup_many(self, domains):
+        return dict(self.iter_lookup_many(domains))
+
+
+whois_engine = WhoisEngine()